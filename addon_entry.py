@@ -11,6 +11,14 @@ from resources.lib import kodiutils, kodilogging
 kodiutils.ADDON = Addon()
 kodilogging.ADDON = Addon()
 
+# The settings might have changed since the previous invocation
+kodiutils.reset_global_settings()
+kodiutils.reset_memo()
+
+# The same goes for the proxy settings. They are read again from the settings snapshot when we make our first request, and the shared
+# session is created again when they have changed.
+kodiutils.invalidate_proxies()
+
 if __name__ == '__main__':
     from sys import argv
     from resources.lib.addon import run
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+""" Shared API objects, so the route handlers and the background service use one session, auth and cache per process """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import logging
+import threading
+
+from resources.lib import kodiutils
+
+_LOGGER = logging.getLogger(__name__)
+
+_INSTANCES = {}
+_KEYS = {}
+_LOCK = threading.RLock()
+
+
+def _get_instance(name, key, factory):
+    """ Return the shared instance with this name. It's created on first use, and created again when its key has changed.
+    :type name: str
+    :type key: any
+    :type factory: callable
+    """
+    with _LOCK:
+        if name not in _INSTANCES or _KEYS[name] != key:
+            _LOGGER.debug('Creating a new %s instance', name)
+            _INSTANCES[name] = factory()
+            _KEYS[name] = key
+        return _INSTANCES[name]
+
+
+def get_auth():
+    """ Return the shared AuthApi. A new one is created when the credentials have changed.
+    :rtype resources.lib.viervijfzes.auth.AuthApi
+    """
+    from resources.lib.viervijfzes.auth import AuthApi
+    key = (kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_tokens_path())
+    return _get_instance('auth', key, lambda: AuthApi(*key))
+
+
+def get_cache():
+    """ Return the shared cache store.
+    :rtype resources.lib.viervijfzes.cache.CacheStore
+    """
+    from resources.lib.viervijfzes.cache import SqliteCacheStore
+    cache_path = kodiutils.get_cache_path()
+    return _get_instance('cache', cache_path, lambda: SqliteCacheStore(cache_path))
+
+
+def get_content_api():
+    """ Return the shared ContentApi. A new one is created when the cache has changed. The auth is only looked up when an authenticated
+    call is made, so listings from the cache don't need to load it.
+    :rtype resources.lib.viervijfzes.content.ContentApi
+    """
+    from resources.lib.viervijfzes.content import ContentApi
+    cache = get_cache()
+    return _get_instance('content', cache, lambda: ContentApi(get_auth, cache=cache))
+
+
+def get_epg_api():
+    """ Return the shared EpgApi.
+    :rtype resources.lib.viervijfzes.epg.EpgApi
+    """
+    from resources.lib.viervijfzes.epg import EpgApi
+    cache = get_cache()
+    return _get_instance('epg', cache, lambda: EpgApi(cache=cache))
+
+
+def get_search_api():
+    """ Return the shared SearchApi.
+    :rtype resources.lib.viervijfzes.search.SearchApi
+    """
+    from resources.lib.viervijfzes.search import SearchApi
+    api = get_content_api()
+    return _get_instance('search', api, lambda: SearchApi(api))
+
+
+def reset():
+    """ Forget all shared instances, so they are created again on next use """
+    with _LOCK:
+        _INSTANCES.clear()
+        _KEYS.clear()
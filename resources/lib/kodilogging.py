@@ -39,7 +39,7 @@ class KodiLogHandler(logging.StreamHandler):
 
         # Map DEBUG level to info_level if debug logging setting has been activated
         # This is for troubleshooting only
-        if ADDON.getSetting('debug_logging') == 'true':
+        if kodiutils.get_setting('debug_logging') == 'true':
             levels[logging.DEBUG] = self.info_level
 
         try:
@@ -35,20 +35,39 @@ DEFAULT_SORT_METHODS = [
     'unsorted', 'title'
 ]
 
+# The patterns are compiled on first use, most invocations never need them
 HTML_MAPPING = [
-    (re.compile(r'<(/?)i(|\s[^>]+)>', re.I), '[\\1I]'),
-    (re.compile(r'<(/?)b(|\s[^>]+)>', re.I), '[\\1B]'),
-    (re.compile(r'<em(|\s[^>]+)>', re.I), '[I]'),
-    (re.compile(r'</em>', re.I), '[/I]'),
-    (re.compile(r'<(strong|h\d)>', re.I), '[B]'),
-    (re.compile(r'</(strong|h\d)>', re.I), '[/B]'),
-    (re.compile(r'<li>', re.I), '- '),
-    (re.compile(r'</?(li|ul|ol)(|\s[^>]+)>', re.I), '\n'),
-    (re.compile(r'</?(code|div|p|pre|span)(|\s[^>]+)>', re.I), ''),
-    (re.compile(r'<br />', re.I), '\n'),  # Remove newlines
-    (re.compile('(&nbsp;\n){2,}', re.I), '\n'),  # Remove repeating non-blocking spaced newlines
-    (re.compile('  +', re.I), ' '),  # Remove double spaces
+    (r'<(/?)i(|\s[^>]+)>', '[\\1I]'),
+    (r'<(/?)b(|\s[^>]+)>', '[\\1B]'),
+    (r'<em(|\s[^>]+)>', '[I]'),
+    (r'</em>', '[/I]'),
+    (r'<(strong|h\d)>', '[B]'),
+    (r'</(strong|h\d)>', '[/B]'),
+    (r'<li>', '- '),
+    (r'</?(li|ul|ol)(|\s[^>]+)>', '\n'),
+    (r'</?(code|div|p|pre|span)(|\s[^>]+)>', ''),
+    (r'<br />', '\n'),  # Remove newlines
+    ('(&nbsp;\n){2,}', '\n'),  # Remove repeating non-blocking spaced newlines
+    ('  +', ' '),  # Remove double spaces
 ]
+_HTML_MAPPING_COMPILED = None
+
+# The Kodi settings we use. They are fetched together in one JSON-RPC batch as soon as we need one of them.
+GLOBAL_SETTINGS = [
+    'locale.language',
+    'network.usehttpproxy',
+    'network.httpproxytype',
+    'network.httpproxyserver',
+    'network.httpproxyport',
+    'network.httpproxyusername',
+    'network.httpproxypassword',
+    'videolibrary.showallitems',
+]
+_GLOBAL_SETTINGS_SNAPSHOT = {}
+
+# The translations and add-on settings we have read through the Kodi API during this invocation
+_LOCALIZED_MEMO = {}
+_SETTINGS_MEMO = {}
 
 STREAM_HLS = 'hls'
 STREAM_DASH = 'mpd'
@@ -59,6 +78,8 @@ _LOGGER = logging.getLogger(__name__)
 class TitleItem:
     """ This helper object holds all information to be used with Kodi xbmc's ListItem object """
 
+    __slots__ = ('title', 'path', 'art_dict', 'info_dict', 'stream_dict', 'prop_dict', 'context_menu', 'subtitles_path', 'is_playable', 'visible')
+
     def __init__(self, title, path=None, art_dict=None, info_dict=None, prop_dict=None, stream_dict=None,
                  context_menu=None, subtitles_path=None, is_playable=False, visible=True):
         """ The constructor for the TitleItem class
@@ -85,7 +106,7 @@ class TitleItem:
         self.visible = visible
 
     def __repr__(self):
-        return "%r" % self.__dict__
+        return "%r" % {name: getattr(self, name) for name in self.__slots__}
 
 
 class SafeDict(dict):
@@ -113,9 +134,12 @@ def from_unicode(text, encoding='utf-8', errors='strict'):
 
 def html_to_kodi(text):
     """Convert HTML content into Kodi formatted text"""
+    global _HTML_MAPPING_COMPILED  # pylint: disable=global-statement
     if not text:
         return text
-    for key, val in HTML_MAPPING:
+    if _HTML_MAPPING_COMPILED is None:
+        _HTML_MAPPING_COMPILED = [(re.compile(key, re.I), val) for key, val in HTML_MAPPING]
+    for key, val in _HTML_MAPPING_COMPILED:
         text = key.sub(val, text)
     return unescape(text).strip()
 
@@ -372,16 +396,37 @@ def set_locale():
 
 def localize(string_id, **kwargs):
     """Return the translated string from the .po language files, optionally translating variables"""
+    if string_id not in _LOCALIZED_MEMO:
+        _LOCALIZED_MEMO[string_id] = ADDON.getLocalizedString(string_id)
     if kwargs:
         from string import Formatter
-        return Formatter().vformat(ADDON.getLocalizedString(string_id), (), SafeDict(**kwargs))
-    return ADDON.getLocalizedString(string_id)
+        return Formatter().vformat(_LOCALIZED_MEMO[string_id], (), SafeDict(**kwargs))
+    return _LOCALIZED_MEMO[string_id]
+
+
+def _read_setting(kind, key, read):
+    """Read an add-on setting with the Kodi API, and remember it for the rest of this invocation"""
+    if (kind, key) not in _SETTINGS_MEMO:
+        _SETTINGS_MEMO[(kind, key)] = read(key)
+    return _SETTINGS_MEMO[(kind, key)]
+
+
+def _forget_setting(key):
+    """Forget an add-on setting that we have changed"""
+    for kind in ('str', 'bool', 'int', 'float'):
+        _SETTINGS_MEMO.pop((kind, key), None)
+
+
+def reset_memo():
+    """Forget the remembered translations and add-on settings, so they are read from Kodi again on next use"""
+    _LOCALIZED_MEMO.clear()
+    _SETTINGS_MEMO.clear()
 
 
 def get_setting(key, default=None):
     """Get an add-on setting as string"""
     try:
-        value = to_unicode(ADDON.getSetting(key))
+        value = to_unicode(_read_setting('str', key, ADDON.getSetting))
     except RuntimeError:  # Occurs when the add-on is disabled
         return default
     if value == '' and default is not None:
@@ -392,7 +437,7 @@ def get_setting(key, default=None):
 def get_setting_bool(key, default=None):
     """Get an add-on setting as boolean"""
     try:
-        return ADDON.getSettingBool(key)
+        return _read_setting('bool', key, ADDON.getSettingBool)
     except (AttributeError, TypeError):  # On Krypton or older, or when not a boolean
         value = get_setting(key, default)
         if value not in ('false', 'true'):
@@ -405,7 +450,7 @@ def get_setting_bool(key, default=None):
 def get_setting_int(key, default=None):
     """Get an add-on setting as integer"""
     try:
-        return ADDON.getSettingInt(key)
+        return _read_setting('int', key, ADDON.getSettingInt)
     except (AttributeError, TypeError):  # On Krypton or older, or when not an integer
         value = get_setting(key, default)
         try:
@@ -419,7 +464,7 @@ def get_setting_int(key, default=None):
 def get_setting_float(key, default=None):
     """Get an add-on setting"""
     try:
-        return ADDON.getSettingNumber(key)
+        return _read_setting('float', key, ADDON.getSettingNumber)
     except (AttributeError, TypeError):  # On Krypton or older, or when not a float
         value = get_setting(key, default)
         try:
@@ -432,11 +477,13 @@ def get_setting_float(key, default=None):
 
 def set_setting(key, value):
     """Set an add-on setting"""
+    _forget_setting(key)
     return ADDON.setSetting(key, from_unicode(str(value)))
 
 
 def set_setting_bool(key, value):
     """Set an add-on setting as boolean"""
+    _forget_setting(key)
     try:
         return ADDON.setSettingBool(key, value)
     except (AttributeError, TypeError):  # On Krypton or older, or when not a boolean
@@ -449,6 +496,7 @@ def set_setting_bool(key, value):
 
 def set_setting_int(key, value):
     """Set an add-on setting as integer"""
+    _forget_setting(key)
     try:
         return ADDON.setSettingInt(key, value)
     except (AttributeError, TypeError):  # On Krypton or older, or when not an integer
@@ -457,6 +505,7 @@ def set_setting_int(key, value):
 
 def set_setting_float(key, value):
     """Set an add-on setting"""
+    _forget_setting(key)
     try:
         return ADDON.setSettingNumber(key, value)
     except (AttributeError, TypeError):  # On Krypton or older, or when not a float
@@ -470,12 +519,43 @@ def open_settings():
 
 def get_global_setting(key):
     """Get a Kodi setting"""
-    result = jsonrpc(method='Settings.GetSettingValue', params={'setting': key})
-    return result.get('result', {}).get('value')
+    return get_global_settings([key])[key]
+
+
+def get_global_settings(keys):
+    """Get several Kodi settings. The settings are remembered for the rest of this invocation."""
+    missing = [key for key in keys if key not in _GLOBAL_SETTINGS_SNAPSHOT]
+    if missing:
+        # Also fetch the other settings we use, they come with the same call
+        missing += [key for key in GLOBAL_SETTINGS if key not in _GLOBAL_SETTINGS_SNAPSHOT and key not in missing]
+        commands = [{'method': 'Settings.GetSettingValue', 'params': {'setting': key}, 'id': idx} for idx, key in enumerate(missing)]
+        try:
+            results = jsonrpc(*commands)
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.debug('Could not fetch the settings in one batch: %s', exc)
+            results = None
+        if isinstance(results, list):
+            # The results of a batch can come in any order
+            results = sorted(results, key=lambda result: result.get('id'))
+        else:
+            results = [jsonrpc(**command) for command in commands]
+        for key, result in zip(missing, results):
+            _GLOBAL_SETTINGS_SNAPSHOT[key] = result.get('result', {}).get('value')
+    return {key: _GLOBAL_SETTINGS_SNAPSHOT.get(key) for key in keys}
+
+
+def reset_global_settings(keys=None):
+    """Forget the remembered Kodi settings, so they are fetched again on next use"""
+    if keys is None:
+        _GLOBAL_SETTINGS_SNAPSHOT.clear()
+        return
+    for key in keys:
+        _GLOBAL_SETTINGS_SNAPSHOT.pop(key, None)
 
 
 def set_global_setting(key, value):
     """Set a Kodi setting"""
+    _GLOBAL_SETTINGS_SNAPSHOT.pop(key, None)
     return jsonrpc(method='Settings.SetSettingValue', params={'setting': key, 'value': value})
 
 
@@ -493,13 +573,28 @@ def has_socks():
 
 
 def get_proxies():
-    """Return a usable proxies dictionary from Kodi proxy settings"""
+    """Return a usable proxies dictionary from Kodi proxy settings, and use a static variable to remember"""
     # Use proxy settings from environment variables
     env_http_proxy = os.environ.get('HTTP_PROXY')
     env_https_proxy = os.environ.get('HTTPS_PROXY')
     if env_http_proxy:
         return {'http': env_http_proxy, 'https': env_https_proxy or env_http_proxy}
 
+    # Reading the Kodi settings takes several JSON-RPC calls, so we only do this once per process
+    if not hasattr(get_proxies, 'cached'):
+        get_proxies.cached = _get_kodi_proxies()
+    return get_proxies.cached
+
+
+def invalidate_proxies():
+    """Forget the remembered proxy settings, so they are read from Kodi again on next use"""
+    if hasattr(get_proxies, 'cached'):
+        del get_proxies.cached
+    reset_global_settings([key for key in GLOBAL_SETTINGS if key.startswith('network.')])
+
+
+def _get_kodi_proxies():
+    """Return a usable proxies dictionary from the proxy settings of Kodi"""
     usehttpproxy = get_global_setting('network.usehttpproxy')
     if usehttpproxy is not True:
         return None
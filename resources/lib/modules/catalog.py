@@ -5,11 +5,11 @@ from __future__ import absolute_import, division, unicode_literals
 
 import logging
 
-from resources.lib import kodiutils
+from resources.lib import context, kodiutils
 from resources.lib.kodiutils import TitleItem
 from resources.lib.modules.menu import Menu
-from resources.lib.viervijfzes.auth import AuthApi
-from resources.lib.viervijfzes.content import CACHE_PREVENT, ContentApi, UnavailableException
+from resources.lib.viervijfzes.content import CACHE_PREVENT, CACHE_STALE_OK, UnavailableException
+from resources.lib.viervijfzes.budget import latency_budget
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,13 +19,13 @@ class Catalog:
 
     def __init__(self):
         """ Initialise object """
-        self._auth = AuthApi(kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_tokens_path())
-        self._api = ContentApi(self._auth, cache_path=kodiutils.get_cache_path())
+        self._api = context.get_content_api()
 
+    @latency_budget('catalog')
     def show_catalog(self):
         """ Show all the programs of all channels """
         try:
-            items = self._api.get_programs()
+            items = self._api.get_programs(cache=CACHE_STALE_OK)
         except Exception as ex:
             kodiutils.notification(message=str(ex))
             raise
@@ -36,12 +36,13 @@ class Catalog:
         # Used for A-Z listing or when movies and episodes are mixed.
         kodiutils.show_listing(listing, 30003, content='tvshows', sort='title')
 
+    @latency_budget('catalog')
     def show_catalog_channel(self, channel):
         """ Show the programs of a specific channel
         :type channel: str
         """
         try:
-            items = self._api.get_programs(channel)
+            items = self._api.get_programs(channel, cache=CACHE_STALE_OK)
         except Exception as ex:
             kodiutils.notification(message=str(ex))
             raise
@@ -54,6 +55,7 @@ class Catalog:
         # Used for A-Z listing or when movies and episodes are mixed.
         kodiutils.show_listing(listing, 30003, content='tvshows', sort='title')
 
+    @latency_budget('program')
     def show_program(self, program_id):
         """ Show a program from the catalog
         :type program_id: str
@@ -140,6 +142,7 @@ class Catalog:
         # Sort by label. Some programs return seasons unordered.
         kodiutils.show_listing(listing, 30003, content='tvshows')
 
+    @latency_budget('program')
     def show_program_season(self, program_id, season_uuid):
         """ Show the episodes of a program from the catalog
         :type program_id: str
@@ -164,6 +167,7 @@ class Catalog:
         # Sort by episode number by default. Takes seasons into account.
         kodiutils.show_listing(listing, 30003, content='episodes', sort=['episode', 'duration'])
 
+    @latency_budget('program')
     def show_program_clips(self, program_id):
         """ Show the clips of a program from the catalog
         :type program_id: str
@@ -181,6 +185,7 @@ class Catalog:
         # Sort like we get our results back.
         kodiutils.show_listing(listing, 30003, content='episodes')
 
+    @latency_budget('category')
     def show_categories(self):
         """ Shows the categories """
         categories = self._api.get_categories()
@@ -195,6 +200,7 @@ class Catalog:
 
         kodiutils.show_listing(listing, 30003, sort=['title'])
 
+    @latency_budget('category')
     def show_category(self, uuid):
         """ Shows a category """
         programs = self._api.get_category_content(int(uuid))
@@ -205,6 +211,7 @@ class Catalog:
 
         kodiutils.show_listing(listing, 30003, content='tvshows')
 
+    @latency_budget('recommendations')
     def show_recommendations(self):
         """ Shows the recommendations """
         # "Meest bekeken" has a specific API endpoint, the other categories are scraped from the website.
@@ -226,14 +233,18 @@ class Catalog:
 
         kodiutils.show_listing(listing, 30005, content='tvshows')
 
+    @latency_budget('recommendations')
     def show_recommendations_category(self, uuid):
         """ Shows the a category of the recommendations """
         if uuid == 'meest-bekeken':
             programs = self._api.get_popular_programs()
             episodes = []
         else:
-            recommendations = self._api.get_recommendation_categories()
-            category = next(category for category in recommendations if category.uuid == uuid)
+            category = self._api.get_recommendation_category(uuid)
+            if category is None:
+                kodiutils.ok_dialog(message=kodiutils.localize(30721))  # This category is not available.
+                kodiutils.end_of_directory()
+                return
             programs = category.programs
             episodes = category.episodes
 
@@ -249,6 +260,7 @@ class Catalog:
 
         kodiutils.show_listing(listing, 30005, content='tvshows')
 
+    @latency_budget('mylist')
     def show_mylist(self):
         """ Show the programs of My List """
         mylist = self._api.get_mylist()
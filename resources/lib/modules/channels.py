@@ -5,11 +5,9 @@ from __future__ import absolute_import, division, unicode_literals
 
 import logging
 
-from resources.lib import kodiutils
+from resources.lib import context, kodiutils
 from resources.lib.kodiutils import TitleItem
 from resources.lib.viervijfzes import CHANNELS, STREAM_DICT
-from resources.lib.viervijfzes.auth import AuthApi
-from resources.lib.viervijfzes.content import ContentApi
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,8 +17,7 @@ class Channels:
 
     def __init__(self):
         """ Initialise object """
-        auth = AuthApi(kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_tokens_path())
-        self._api = ContentApi(auth, cache_path=kodiutils.get_cache_path())
+        self._api = context.get_content_api()
 
     @staticmethod
     def show_channels():
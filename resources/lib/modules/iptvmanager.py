@@ -3,12 +3,12 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+import json
 import logging
 from datetime import datetime, timedelta
 
-from resources.lib import kodiutils
+from resources.lib import context, kodiutils
 from resources.lib.viervijfzes import CHANNELS
-from resources.lib.viervijfzes.epg import EpgApi
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -25,12 +25,17 @@ class IPTVManager:
 
         def send(self):
             """Decorator to send over a socket"""
-            import json
             import socket
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.connect(('127.0.0.1', self.port))
             try:
-                sock.sendall(json.dumps(func()).encode())  # pylint: disable=not-callable
+                result = func()  # pylint: disable=not-callable
+                if isinstance(result, dict):
+                    sock.sendall(json.dumps(result).encode())
+                else:
+                    # Send the chunks of a streaming result as soon as they are ready
+                    for chunk in result:
+                        sock.sendall(chunk.encode())
             finally:
                 sock.close()
 
@@ -57,7 +62,7 @@ class IPTVManager:
     @via_socket
     def send_epg():  # pylint: disable=no-method-argument
         """Return JSON-EPG formatted information to IPTV Manager"""
-        epg_api = EpgApi()
+        epg_api = context.get_epg_api()
 
         try:  # Python 3
             from urllib.parse import quote
@@ -66,19 +71,22 @@ class IPTVManager:
 
         today = datetime.today()
 
-        results = {}
-        for key, channel in CHANNELS.items():
-            iptv_id = channel.get('iptv_id')
-
-            if channel.get('iptv_id'):
-                results[iptv_id] = []
-
-                for i in range(-3, 7):
-                    date = today + timedelta(days=i)
-                    epg = epg_api.get_epg(key, date.strftime('%Y-%m-%d'))
-
-                    results[iptv_id].extend([
-                        {
+        # Fetch all the days of all the channels in parallel, and stream them in order as they arrive
+        epg_requests = [
+            (key, (today + timedelta(days=i)).strftime('%Y-%m-%d'))
+            for key, channel in CHANNELS.items() if channel.get('iptv_id')
+            for i in range(-3, 7)
+        ]
+
+        def generate_days():
+            """ Yield the iptv_id and the JSON-EPG programmes of every requested day """
+            for (key, _), epg in epg_api.iter_epg_multiple(epg_requests):
+                programmes = []
+                for program in epg:
+                    if not program.duration:
+                        continue
+                    try:
+                        programmes.append({
                             'start': program.start.isoformat(),
                             'stop': (program.start + timedelta(seconds=program.duration)).isoformat(),
                             'title': program.program_title,
@@ -91,8 +99,44 @@ class IPTVManager:
                             'stream': kodiutils.url_for('play_from_page',
                                                         channel=key,
                                                         page=quote(program.video_url, safe='')) if program.video_url else None
-                        }
-                        for program in epg if program.duration
-                    ])
-
-        return {'version': 1, 'epg': results}
+                        })
+                    except Exception as exc:  # pylint: disable=broad-except
+                        # Skip this programme, so it doesn't affect the rest of the guide
+                        _LOGGER.warning('Could not add %s of %s to the EPG: %s', program.program_title, key, exc)
+                yield CHANNELS[key].get('iptv_id'), programmes
+
+        return stream_json_epg(generate_days())
+
+
+def stream_json_epg(days):
+    """Yield a JSON-EPG document in chunks, without keeping the whole guide in memory.
+    A day that fails is skipped, and when reading the days fails, the document is closed with what we have, so IPTV Manager always
+    receives valid JSON.
+    :param days: The iptv_id and a list of programmes for every day. The days of a channel need to be consecutive.
+    :type days: collections.Iterable[tuple[str, list[dict]]]
+    :rtype collections.Iterable[str]
+    """
+    yield '{"version": 1, "epg": {'
+    current_id = None
+    has_programmes = False
+    try:
+        for iptv_id, programmes in days:
+            if iptv_id != current_id:
+                yield '%s%s: [' % ('], ' if current_id is not None else '', json.dumps(iptv_id))
+                current_id = iptv_id
+                has_programmes = False
+            if programmes:
+                # Build the whole chunk before we send anything of it, so we can skip a day that fails
+                try:
+                    chunk = ', '.join(json.dumps(programme) for programme in programmes)
+                except (TypeError, ValueError) as exc:
+                    _LOGGER.warning('Could not send a day of the EPG of %s: %s', iptv_id, exc)
+                    continue
+                yield '%s%s' % (', ' if has_programmes else '', chunk)
+                has_programmes = True
+    except Exception as exc:  # pylint: disable=broad-except
+        # The start of the document is already sent, so we still close it to keep it valid JSON
+        _LOGGER.error('Could not send the complete EPG: %s', exc)
+    if current_id is not None:
+        yield ']'
+    yield '}}'
@@ -117,7 +117,7 @@ class Menu:
         if isinstance(item, Program):
             info_dict.update({
                 'mediatype': None,
-                'season': len(item.seasons) if item.seasons else None,
+                'season': item.season_count or None,
             })
 
             art_dict = {
@@ -5,12 +5,12 @@ from __future__ import absolute_import, division, unicode_literals
 
 import logging
 
-from resources.lib import kodiutils
+from resources.lib import context, kodiutils
 from resources.lib.modules.menu import Menu
 from resources.lib.viervijfzes import CHANNELS, ResolvedStream
-from resources.lib.viervijfzes.auth import AuthApi
+from resources.lib.viervijfzes.auth import LoginInProgressException
 from resources.lib.viervijfzes.aws.cognito_idp import AuthenticationException, InvalidLoginException
-from resources.lib.viervijfzes.content import CACHE_PREVENT, ContentApi, GeoblockedException, UnavailableException
+from resources.lib.viervijfzes.content import CACHE_PREVENT, GeoblockedException, UnavailableException
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,8 +20,7 @@ class Player:
 
     def __init__(self):
         """ Initialise object """
-        auth = AuthApi(kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_tokens_path())
-        self._api = ContentApi(auth, cache_path=kodiutils.get_cache_path())
+        self._api = context.get_content_api()
 
         # Workaround for Raspberry Pi 3 and older
         kodiutils.set_global_setting('videoplayer.useomxplayer', True)
@@ -112,10 +111,8 @@ class Player:
 
             # Fetch an auth token now
             try:
-                auth = AuthApi(kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_tokens_path())
-
                 # Get stream information
-                resolved_stream = ContentApi(auth).get_stream_by_uuid(uuid, islongform)
+                resolved_stream = context.get_content_api().get_stream_by_uuid(uuid, islongform)
                 return resolved_stream
 
             except (InvalidLoginException, AuthenticationException) as ex:
@@ -124,6 +121,12 @@ class Player:
                 kodiutils.end_of_directory()
                 return None
 
+            except LoginInProgressException as ex:
+                _LOGGER.warning(ex)
+                kodiutils.ok_dialog(message=kodiutils.localize(30703))  # Another login is still in progress...
+                kodiutils.end_of_directory()
+                return None
+
         except GeoblockedException:
             kodiutils.ok_dialog(message=kodiutils.localize(30710))  # This video is geo-blocked...
             return None
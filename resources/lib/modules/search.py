@@ -5,9 +5,8 @@ from __future__ import absolute_import, division, unicode_literals
 
 import logging
 
-from resources.lib import kodiutils
+from resources.lib import context, kodiutils
 from resources.lib.modules.menu import Menu
-from resources.lib.viervijfzes.search import SearchApi
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -17,7 +16,7 @@ class Search:
 
     def __init__(self):
         """ Initialise object """
-        self._search = SearchApi()
+        self._search = context.get_search_api()
 
     def show_search(self, query=None):
         """ Shows the search dialog
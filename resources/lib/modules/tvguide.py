@@ -6,12 +6,12 @@ from __future__ import absolute_import, division, unicode_literals
 import logging
 from datetime import datetime, timedelta
 
-from resources.lib import kodiutils
+from resources.lib import context, kodiutils
 from resources.lib.kodiutils import TitleItem
 from resources.lib.modules.player import Player
 from resources.lib.viervijfzes import STREAM_DICT
 from resources.lib.viervijfzes.content import UnavailableException
-from resources.lib.viervijfzes.epg import EpgApi
+from resources.lib.viervijfzes.budget import latency_budget
 
 try:  # Python 3
     from urllib.parse import quote
@@ -26,7 +26,7 @@ class TvGuide:
 
     def __init__(self):
         """ Initialise object """
-        self._epg = EpgApi()
+        self._epg = context.get_epg_api()
 
     @staticmethod
     def get_dates(date_format):
@@ -97,6 +97,7 @@ class TvGuide:
 
         kodiutils.show_listing(listing, 30013, content='files', sort=['date'])
 
+    @latency_budget('tvguide')
     def show_detail(self, channel=None, date=None):
         """ Shows the programs of a specific date in the tv guide
         :type channel: str
@@ -5,45 +5,192 @@ from __future__ import absolute_import, division, unicode_literals
 
 import hashlib
 import logging
+import random
+import time
 
 from xbmc import Monitor, Player, getInfoLabel
 
-from resources.lib import kodilogging, kodiutils
-from resources.lib.viervijfzes.auth import AuthApi
+from resources.lib import context, kodilogging, kodiutils
+from resources.lib.viervijfzes.aws.cognito_idp import AuthenticationException, InvalidLoginException
+from resources.lib.viervijfzes.content import CACHE_PREVENT
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class ScheduledTask:
+    """ A task that runs periodically in the background service """
+
+    JITTER = 0.1  # Spread the runs with 10% so we don't hit the servers at fixed times
+
+    def __init__(self, name, func, interval, delay=60, prewarm=False):
+        """ Initialise object
+        :type name: str
+        :type func: callable
+        :type interval: int
+        :type delay: int
+        :type prewarm: bool
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.prewarm = prewarm  # Only run when prewarming the caches is enabled
+        self.next_run = 0
+        self.schedule(delay)
+
+    def schedule(self, delay=None):
+        """ Plan the next run of this task """
+        if delay is None:
+            delay = self.interval
+        self.next_run = time.time() + delay * random.uniform(1 - self.JITTER, 1 + self.JITTER)
+
+
 class BackgroundService(Monitor):
     """ Background service code """
 
+    REFRESH_BACKOFF_MAX = 60 * 60  # Wait at most an hour before we try to refresh the token again after an error
+
     def __init__(self):
         Monitor.__init__(self)
         self.update_interval = 24 * 3600  # Every 24 hours
         self.cache_expiry = 30 * 24 * 3600  # One month
-        self._auth = AuthApi(kodiutils.get_setting('username'), kodiutils.get_setting('password'), kodiutils.get_tokens_path())
+        self._auth = context.get_auth()
+        self._cache = context.get_cache()
+        self._api = context.get_content_api()
+        self._epg = context.get_epg_api()
         self._kodiplayer = KodiPlayer()
+        self._login_refused = False  # Don't try to log in again until the credentials have changed
+        self._refresh_failures = 0  # The number of token refreshes that failed in a row
+        self._refresh_retry = 0  # Don't try to refresh the token again before this time
+
+        # These tasks run at the configured prewarm interval
+        prewarm_interval = self._get_prewarm_interval()
+        self._prewarm_tasks = [
+            ScheduledTask('programs', self._prewarm_programs, prewarm_interval, prewarm=True),
+            ScheduledTask('program_tree', self._prewarm_program_tree, prewarm_interval, prewarm=True),
+            ScheduledTask('epg', self._prewarm_epg, prewarm_interval, prewarm=True),
+        ]
+        self._tasks = self._prewarm_tasks + [
+            ScheduledTask('mylist', self._prewarm_mylist, self.update_interval, delay=5 * 60, prewarm=True),
+            ScheduledTask('purge', self._purge_cache, self.update_interval, delay=10 * 60),
+            ScheduledTask('token', self._refresh_token, 60, delay=30),
+            ScheduledTask('proxies', self._check_proxies, 10 * 60),
+        ]
 
     def run(self):
         """ Background loop for maintenance tasks """
         _LOGGER.debug('Service started')
 
         while not self.abortRequested():
+            # Refresh the cache items that were served expired
+            try:
+                self._api.refresh_queued()
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.warning('Refreshing the queued cache items failed: %s', exc)
+
+            # Run the tasks that are due
+            for task in self._tasks:
+                if self.abortRequested():
+                    break
+                if task.next_run > time.time():
+                    continue
+                if task.prewarm and not kodiutils.get_setting_bool('prewarm_enabled', default=True):
+                    task.schedule()
+                    continue
+                _LOGGER.debug('Running background task %s', task.name)
+                try:
+                    task.func()
+                except Exception as exc:  # pylint: disable=broad-except
+                    _LOGGER.warning('Background task %s failed: %s', task.name, exc)
+                task.schedule()
+
             # Stop when abort requested
             if self.waitForAbort(10):
                 break
 
         _LOGGER.debug('Service stopped')
 
+    @staticmethod
+    def _get_prewarm_interval():
+        """ Return the configured interval for refreshing the caches in seconds """
+        return max(kodiutils.get_setting_int('prewarm_interval', default=30), 10) * 60
+
+    def _prewarm_programs(self):
+        """ Refresh the A-Z catalog """
+        self._api.get_programs(cache=CACHE_PREVENT)
+
+    def _prewarm_program_tree(self):
+        """ Refresh the content tree that is used for the categories """
+        self._api.get_program_tree(cache=CACHE_PREVENT)
+
+    def _prewarm_epg(self):
+        """ Refresh the TV guide of today """
+        for channel in self._epg.EPG_ENDPOINTS:
+            if self.abortRequested():
+                return
+            # Refresh with a conditional request, so we keep our cached copy when nothing has changed
+            self._epg.get_epg(channel, 'today', refresh=True)
+
+    def _prewarm_mylist(self):
+        """ Refresh the program pages of the items in My List """
+        if not kodiutils.get_setting('username') or not kodiutils.get_setting('password') or self._login_refused:
+            return
+        for program in self._api.get_mylist():
+            if self.abortRequested():
+                return
+            self._api.get_program(program.path, cache=CACHE_PREVENT)
+
+    def _refresh_token(self):
+        """ Renew the id token before it expires, so playback doesn't need to wait for it """
+        if self._login_refused or time.time() < self._refresh_retry:
+            return
+        try:
+            self._auth.refresh_if_needed()
+        except InvalidLoginException as exc:
+            # Trying again with the same credentials would only risk locking the account
+            _LOGGER.warning('Not refreshing the id token until the credentials have changed: %s', exc)
+            self._login_refused = True
+            return
+        except AuthenticationException as exc:
+            # This might be a hiccup of the service, so we try again later, but wait longer after every failure
+            self._refresh_failures += 1
+            backoff = min(60 * 2 ** self._refresh_failures, self.REFRESH_BACKOFF_MAX)
+            _LOGGER.warning('Could not refresh the id token, trying again in %d seconds: %s', backoff, exc)
+            self._refresh_retry = time.time() + backoff
+            return
+        self._refresh_failures = 0
+
+    def _check_proxies(self):
+        """ Use the new proxy settings when they were changed in Kodi. We are not notified of this, so we read them again now and then. The
+        shared session is created again on its next use when they have changed. """
+        kodiutils.invalidate_proxies()
+
+    def _purge_cache(self):
+        """ Remove the cache items that have been expired for a long time """
+        self._cache.purge(self.cache_expiry)
+
     def onSettingsChanged(self):  # pylint: disable=invalid-name
         """ Callback when a setting has changed """
+        kodiutils.reset_memo()
+
         if self._has_credentials_changed():
             _LOGGER.debug('Clearing auth tokens due to changed credentials')
             self._auth.clear_tokens()
+            self._auth = context.get_auth()
+            self._api = context.get_content_api()
+            self._login_refused = False
+            self._refresh_failures = 0
+            self._refresh_retry = 0
 
             # Refresh container
             kodiutils.container_refresh()
 
+        # Apply the new refresh interval
+        prewarm_interval = self._get_prewarm_interval()
+        for task in self._prewarm_tasks:
+            if task.interval != prewarm_interval:
+                task.interval = prewarm_interval
+                task.schedule()
+
     @staticmethod
     def _has_credentials_changed():
         """ Check if credentials have changed """
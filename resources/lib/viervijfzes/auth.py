@@ -3,10 +3,15 @@
 
 from __future__ import absolute_import, division, unicode_literals
 
+import base64
+import errno
 import json
 import logging
 import os
 import time
+from contextlib import contextmanager
+
+from requests import HTTPError
 
 from resources.lib import kodiutils
 from resources.lib.viervijfzes.aws.cognito_identity import CognitoIdentity
@@ -16,6 +21,10 @@ from resources.lib.viervijfzes.aws.cognito_sync import CognitoSync
 _LOGGER = logging.getLogger(__name__)
 
 
+class LoginInProgressException(Exception):
+    """ Is thrown when we gave up waiting for another process to finish logging in """
+
+
 class AuthApi:
     """ GoPlay Authentication API """
     COGNITO_REGION = 'eu-west-1'
@@ -24,74 +33,217 @@ class AuthApi:
     COGNITO_IDENTITY_POOL_ID = 'eu-west-1:8b7eb22c-cf61-43d5-a624-04b494867234'
 
     TOKEN_FILE = 'auth-tokens.json'
+    LOCK_FILE = 'auth-tokens.lock'
+    LOCK_TIMEOUT = 30  # Seconds to wait for another process to finish logging in
+    LOCK_STALE = 25  # Seconds after which we consider a lock abandoned, this is shorter than LOCK_TIMEOUT so we break it while waiting
+    TOKEN_LIFETIME = 3600  # Used when we can't read the expiry from the token
+    CREDENTIALS_MARGIN = 60  # Request new AWS credentials this many seconds before they expire
 
-    def __init__(self, username, password, token_path):
-        """ Initialise object """
+    def __init__(self, username, password, token_path, refresh_margin=None):
+        """ Initialise object
+        :type username: str
+        :type password: str
+        :type token_path: str
+        :type refresh_margin: int
+        """
         self._username = username
         self._password = password
         self._token_path = token_path
         self._id_token = None
         self._expiry = 0
         self._refresh_token = None
+        self._identity_id = None
+        self._credentials = None
+        self._stored_tokens = None
+
+        # Refresh the id token this many seconds before it really expires
+        if refresh_margin is None:
+            refresh_margin = kodiutils.get_setting_int('token_refresh_margin', default=5) * 60
+        self._refresh_margin = refresh_margin
 
         # Load tokens from cache
+        self._load_tokens()
+
+    def _load_tokens(self):
+        """ Load the tokens from the cache """
         try:
             with open(os.path.join(self._token_path, self.TOKEN_FILE), 'r') as fdesc:
                 data_json = json.loads(fdesc.read())
                 self._id_token = data_json.get('id_token')
                 self._refresh_token = data_json.get('refresh_token')
                 self._expiry = int(data_json.get('expiry', 0))
+                self._identity_id = data_json.get('identity_id')
+                self._credentials = data_json.get('credentials')
+                self._stored_tokens = self._dump_tokens()
         except (IOError, TypeError, ValueError):
             _LOGGER.warning('We could not use the cache since it is invalid or non-existent.')
 
+    def _save_tokens(self):
+        """ Store the tokens in the cache when they have changed. The file is replaced atomically, so readers never see half a file. """
+        tokens = self._dump_tokens()
+        if tokens == self._stored_tokens:
+            return
+
+        if not os.path.exists(self._token_path):
+            os.makedirs(self._token_path)
+        filename = os.path.join(self._token_path, self.TOKEN_FILE)
+        temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+        with open(temp_filename, 'w') as fdesc:
+            fdesc.write(kodiutils.from_unicode(json.dumps(tokens)))
+        os.replace(temp_filename, filename)
+        self._stored_tokens = tokens
+
+    def _dump_tokens(self):
+        """ Return the tokens as they are stored in the cache
+        :rtype dict
+        """
+        return {
+            'id_token': self._id_token,
+            'refresh_token': self._refresh_token,
+            'expiry': self._expiry,
+            'identity_id': self._identity_id,
+            'credentials': self._credentials,
+        }
+
+    @contextmanager
+    def _lock(self):
+        """ Make sure only one process at a time refreshes the tokens """
+        if not os.path.exists(self._token_path):
+            os.makedirs(self._token_path)
+        filename = os.path.join(self._token_path, self.LOCK_FILE)
+
+        deadline = time.time() + self.LOCK_TIMEOUT
+        while True:
+            try:
+                fdesc = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            try:
+                if os.stat(filename).st_mtime < time.time() - self.LOCK_STALE:
+                    _LOGGER.warning('Removing an abandoned lock on the auth tokens')
+                    os.unlink(filename)
+                    continue
+            except OSError:
+                continue  # The lock was just released
+            if time.time() > deadline:
+                raise LoginInProgressException('Timeout while waiting for another login to finish')
+            time.sleep(0.1)
+
+        try:
+            os.write(fdesc, str(os.getpid()).encode('ascii'))
+            yield
+        finally:
+            os.close(fdesc)
+            os.unlink(filename)
+
+    @staticmethod
+    def get_token_expiry(token):
+        """ Return the expiry of a JWT token from its exp claim, or None when it can't be decoded.
+        :type token: str
+        :rtype int
+        """
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)  # Add the padding that JWT leaves out
+            return int(json.loads(base64.urlsafe_b64decode(payload.encode('ascii')).decode('utf-8'))['exp'])
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as exc:
+            _LOGGER.warning('Could not read the expiry of the id token: %s', exc)
+            return None
+
+    def needs_refresh(self):
+        """ Check if the id token is about to expire, and we should get a new one.
+        :rtype bool
+        """
+        return not self._id_token or self._expiry - self._refresh_margin <= int(time.time())
+
+    def refresh_if_needed(self):
+        """ Get a new id token ahead of time when it is about to expire, so nobody needs to wait for it.
+        :rtype bool
+        """
+        if not self._username or not self._password:
+            return False
+
+        # Another process might have refreshed the tokens already
+        self._load_tokens()
+        if not self.needs_refresh():
+            return False
+
+        _LOGGER.debug('Refreshing the id token ahead of time')
+        self.get_token()
+        return True
+
+    def _set_expiry(self, now):
+        """ Set the expiry of our id token """
+        self._expiry = self.get_token_expiry(self._id_token) or now + self.TOKEN_LIFETIME
+
     def get_token(self):
         """ Get a valid token """
         now = int(time.time())
 
-        if self._id_token and self._expiry > now:
+        if not self.needs_refresh():
             # We have a valid id token in memory, use it
             _LOGGER.debug('Got an id token from memory')
             return self._id_token
 
+        try:
+            with self._lock():
+                # Another process might have refreshed the tokens while we were waiting for the lock
+                self._load_tokens()
+                if not self.needs_refresh():
+                    _LOGGER.debug('Got an id token that was refreshed by another process')
+                    return self._id_token
+
+                self._renew_tokens(now)
+                self._save_tokens()
+        except LoginInProgressException:
+            if not self._id_token or self._expiry <= now:
+                raise
+            # We wanted to refresh ahead of time, so we can keep using our current id token for now
+            _LOGGER.warning('Another login is taking too long, keeping the current id token until it expires')
+
+        return self._id_token
+
+    def _renew_tokens(self, now):
+        """ Get a new id token by refreshing, or by logging in """
         if self._refresh_token:
             # We have a valid refresh token, use that to refresh our id token
             # The refresh token is valid for 30 days. If this refresh fails, we just continue by logging in again.
             _LOGGER.debug('Getting an id token by refreshing')
             try:
                 self._id_token = self._refresh(self._refresh_token)
-                self._expiry = now + 3600
+                self._set_expiry(now)
             except (InvalidLoginException, AuthenticationException) as exc:
                 _LOGGER.error('Error logging in: %s', str(exc))
                 self._id_token = None
                 self._refresh_token = None
                 self._expiry = 0
                 # We continue by logging in with username and password
+            except Exception as exc:  # pylint: disable=broad-except
+                if not self._id_token or self._expiry <= now:
+                    raise
+                # We refreshed ahead of time, so we can keep using our current id token for now
+                _LOGGER.warning('Could not refresh the id token, keeping the current one until it expires: %s', exc)
+                return
 
-        if not self._id_token:
+        if self.needs_refresh():
             # We have no tokens, or they are all invalid, do a login
             _LOGGER.debug('Getting an id token by logging in')
             id_token, refresh_token = self._authenticate(self._username, self._password)
             self._id_token = id_token
             self._refresh_token = refresh_token
-            self._expiry = now + 3600
-
-        # Store new tokens in cache
-        if not os.path.exists(self._token_path):
-            os.makedirs(self._token_path)
-        with open(os.path.join(self._token_path, self.TOKEN_FILE), 'w') as fdesc:
-            data = json.dumps({
-                'id_token': self._id_token,
-                'refresh_token': self._refresh_token,
-                'expiry': self._expiry
-            })
-            fdesc.write(kodiutils.from_unicode(data))
+            self._set_expiry(now)
 
-        return self._id_token
+            # We might have logged in as another user
+            self._identity_id = None
+            self._credentials = None
 
     def clear_tokens(self):
         """ Remove the cached tokens. """
         if os.path.exists(os.path.join(self._token_path, AuthApi.TOKEN_FILE)):
             os.unlink(os.path.join(self._token_path, AuthApi.TOKEN_FILE))
+        self._stored_tokens = None
 
     @staticmethod
     def _authenticate(username, password):
@@ -105,15 +257,55 @@ class AuthApi:
         idp_client = CognitoIdp(AuthApi.COGNITO_POOL_ID, AuthApi.COGNITO_CLIENT_ID)
         return idp_client.renew_token(refresh_token)
 
-    def get_dataset(self, dataset, key):
-        """ Fetch the value from the specified dataset. """
-        identity_client = CognitoIdentity(AuthApi.COGNITO_POOL_ID, AuthApi.COGNITO_IDENTITY_POOL_ID)
+    def has_valid_credentials(self):
+        """ Check if we have an identity id and AWS credentials that are still valid for a while.
+        :rtype bool
+        """
+        if not self._identity_id or not self._credentials:
+            return False
+        try:
+            expiration = float(self._credentials.get('Expiration'))
+        except (TypeError, ValueError):
+            return False
+        return expiration - self.CREDENTIALS_MARGIN > time.time()
+
+    def get_identity(self, rejected=None):
+        """ Get the identity id and the AWS credentials. The identity id never changes, and the credentials are valid for an hour, so we
+        only request them from Cognito when we have no valid ones in the cache.
+        :param dict rejected:           Credentials that were refused by AWS, and should not be used anymore.
+        :rtype tuple[str, dict]
+        """
+        if self.has_valid_credentials() and self._credentials != rejected:
+            _LOGGER.debug('Got AWS credentials from memory')
+            return self._identity_id, self._credentials
+
         id_token = self.get_token()
-        identity_id = identity_client.get_id(id_token)
-        credentials = identity_client.get_credentials_for_identity(id_token, identity_id)
+        with self._lock():
+            # Another process might have requested new credentials while we were waiting for the lock
+            self._load_tokens()
+            if not self.has_valid_credentials() or self._credentials == rejected:
+                identity_client = CognitoIdentity(AuthApi.COGNITO_POOL_ID, AuthApi.COGNITO_IDENTITY_POOL_ID)
+                if not self._identity_id:
+                    self._identity_id = identity_client.get_id(id_token)
+                self._credentials = identity_client.get_credentials_for_identity(id_token, self._identity_id)
+                self._save_tokens()
+
+        return self._identity_id, self._credentials
 
+    def get_dataset(self, dataset, key):
+        """ Fetch the value from the specified dataset. """
+        identity_id, credentials = self.get_identity()
         sync_client = CognitoSync(AuthApi.COGNITO_IDENTITY_POOL_ID, identity_id, credentials)
-        data, session_token, sync_count = sync_client.list_records(dataset, key)
+        try:
+            data, session_token, sync_count = sync_client.list_records(dataset, key)
+        except HTTPError as exc:
+            if exc.response is None or exc.response.status_code not in (400, 403):
+                raise
+            # Our cached credentials were rejected, request new ones and try again
+            _LOGGER.warning('The AWS credentials were rejected, requesting new ones: %s', exc)
+            identity_id, credentials = self.get_identity(rejected=credentials)
+            sync_client = CognitoSync(AuthApi.COGNITO_IDENTITY_POOL_ID, identity_id, credentials)
+            data, session_token, sync_count = sync_client.list_records(dataset, key)
 
         sync_info = {
             'identity_id': identity_id,
@@ -6,7 +6,7 @@ from __future__ import absolute_import, division, unicode_literals
 import json
 import logging
 
-import requests
+from resources.lib.viervijfzes import transport
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,7 +29,15 @@ class CognitoIdentity:
         self.identity_pool_id = identity_pool_id
         self.region = self.pool_id.split("_")[0]
         self.url = "https://cognito-identity.%s.amazonaws.com/" % self.region
-        self._session = requests.session()
+        self._session = None  # We use the shared session, unless one is set here
+
+    def _get_session(self):
+        """ Return the shared HTTP session, unless one was set on this client.
+        :rtype requests.Session
+        """
+        if self._session is not None:
+            return self._session
+        return transport.get_session()
 
     def get_id(self, id_token):
         """ Get the Identity ID based on the id_token. """
@@ -40,7 +48,7 @@ class CognitoIdentity:
                 provider: id_token,
             }
         }
-        response = self._session.post(self.url, json=data, headers={
+        response = self._get_session().post(self.url, json=data, headers={
             'x-amz-target': 'AWSCognitoIdentityService.GetId',
             'content-type': 'application/x-amz-json-1.1',
         })
@@ -59,7 +67,7 @@ class CognitoIdentity:
             }
         }
 
-        response = self._session.post(self.url, json=data, headers={
+        response = self._get_session().post(self.url, json=data, headers={
             'x-amz-target': 'AWSCognitoIdentityService.GetCredentialsForIdentity',
             'content-type': 'application/x-amz-json-1.1',
         })
@@ -13,9 +13,10 @@ import json
 import logging
 import os
 
-import requests
 import six
 
+from resources.lib.viervijfzes import transport
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -47,7 +48,7 @@ class CognitoIdp:
         self.client_id = client_id
         self.region = self.pool_id.split("_")[0]
         self.url = "https://cognito-idp.%s.amazonaws.com/" % (self.region,)
-        self._session = requests.session()
+        self._session = None  # We use the shared session, unless one is set here
 
         # Initialize the values
         # https://github.com/aws/amazon-cognito-identity-js/blob/master/src/AuthenticationHelper.js#L22
@@ -75,8 +76,32 @@ class CognitoIdp:
         self.big_n = self.__hex_to_long(self.n_hex)
         self.g = self.__hex_to_long(self.g_hex)  # pylint: disable=invalid-name
         self.k = self.__hex_to_long(self.__hex_hash('00' + self.n_hex + '0' + self.g_hex))  # pylint: disable=invalid-name
-        self.small_a_value = self.__generate_random_small_a()
-        self.large_a_value = self.__calculate_a()
+
+        # The SRP values are only needed for authenticate(), and calculating A is expensive on slow devices
+        self._small_a_value = None
+        self._large_a_value = None
+
+    @property
+    def small_a_value(self):
+        """ The client's random private value a. It is generated on first use. """
+        if self._small_a_value is None:
+            self._small_a_value = self.__generate_random_small_a()
+        return self._small_a_value
+
+    @property
+    def large_a_value(self):
+        """ The client's public value A = g^a%N. It is calculated on first use. """
+        if self._large_a_value is None:
+            self._large_a_value = self.__calculate_a()
+        return self._large_a_value
+
+    def _get_session(self):
+        """ Return the shared HTTP session, unless one was set on this client.
+        :rtype requests.Session
+        """
+        if self._session is not None:
+            return self._session
+        return transport.get_session()
 
     def authenticate(self, username, password):
         """ Authenticate with a username and password. """
@@ -88,7 +113,7 @@ class CognitoIdp:
             "Accept-Encoding": "identity",
             "Content-Type": "application/x-amz-json-1.1"
         }
-        auth_response = self._session.post(self.url, auth_data, headers=auth_headers)
+        auth_response = self._get_session().post(self.url, auth_data, headers=auth_headers)
         auth_response_json = json.loads(auth_response.text)
         challenge_parameters = auth_response_json.get("ChallengeParameters")
 
@@ -103,7 +128,7 @@ class CognitoIdp:
             "X-Amz-Target": "AWSCognitoIdentityProviderService.RespondToAuthChallenge",
             "Content-Type": "application/x-amz-json-1.1"
         }
-        auth_response = self._session.post(self.url, challenge_data, headers=challenge_headers)
+        auth_response = self._get_session().post(self.url, challenge_data, headers=challenge_headers)
         auth_response_json = json.loads(auth_response.text)
 
         if "message" in auth_response_json:
@@ -134,7 +159,7 @@ class CognitoIdp:
             "Content-Type": "application/x-amz-json-1.1"
         }
         refresh_request_data = json.dumps(refresh_request)
-        refresh_response = self._session.post(self.url, refresh_request_data, headers=refresh_headers)
+        refresh_response = self._get_session().post(self.url, refresh_request_data, headers=refresh_headers)
         refresh_json = json.loads(refresh_response.text)
 
         if "message" in refresh_json:
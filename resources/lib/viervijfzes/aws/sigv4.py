@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+""" AWS Signature Version 4 implementation without external dependencies """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import datetime
+import hashlib
+import hmac
+import logging
+import threading
+
+try:  # Python 3
+    from urllib.parse import parse_qsl, quote, urlparse
+except ImportError:  # Python 2
+    from urllib import quote
+
+    from urlparse import parse_qsl, urlparse
+
+_LOGGER = logging.getLogger(__name__)
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b'').hexdigest()
+
+# The derived signing keys are only valid for one day, region and service, so we don't need to keep many of them
+_SIGNING_KEYS = {}
+_SIGNING_KEYS_LOCK = threading.Lock()
+_SIGNING_KEYS_MAX = 16
+
+
+def _hmac_sha256(key, msg):
+    """ Sign this message. """
+    return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+
+
+def get_signing_key(secret_key, datestamp, region, service):
+    """ Return the signing key that is derived from the secret key. The key is only derived once per day, region and service.
+
+    :param str secret_key:          The AWS secret key.
+    :param str datestamp:           The date in YYYYMMDD format.
+    :param str region:              The AWS region.
+    :param str service:             The AWS service.
+    :rtype: bytes
+    """
+    cache_key = (secret_key, datestamp, region, service)
+    with _SIGNING_KEYS_LOCK:
+        signing_key = _SIGNING_KEYS.get(cache_key)
+        if signing_key is None:
+            k_date = _hmac_sha256(('AWS4' + secret_key).encode('utf-8'), datestamp)
+            k_region = _hmac_sha256(k_date, region)
+            k_service = _hmac_sha256(k_region, service)
+            signing_key = _hmac_sha256(k_service, 'aws4_request')
+
+            if len(_SIGNING_KEYS) >= _SIGNING_KEYS_MAX:
+                _SIGNING_KEYS.clear()
+            _SIGNING_KEYS[cache_key] = signing_key
+    return signing_key
+
+
+def get_canonical_querystring(query):
+    """ Return the query string with the parameters sorted by name and value, and with every name and value encoded the way AWS expects.
+
+    :param str query:               The query string of the url.
+    :rtype: str
+    """
+    params = [(quote(key, safe='-_.~'), quote(value, safe='-_.~')) for key, value in parse_qsl(query, keep_blank_values=True)]
+    return '&'.join('%s=%s' % param for param in sorted(params))
+
+
+class SigV4Signer:
+    """ Signs requests with AWS Signature Version 4
+
+    More info at https://docs.aws.amazon.com/general/latest/gr/signature-version-4.html.
+    """
+
+    def __init__(self, access_key, secret_key, region, service):
+        """ Initialise object
+
+        :param str access_key:          The AWS access key id.
+        :param str secret_key:          The AWS secret key.
+        :param str region:              The AWS region.
+        :param str service:             The AWS service where the requests are going to.
+        """
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.service = service
+
+    def get_authorization(self, method, url, headers, payload, amzdate):
+        """ Return the value of the Authorization header for this request.
+
+        :param str method:              The HTTP method.
+        :param str url:                 The full url, including the query string.
+        :param dict[str, str] headers:  The headers to sign. This should at least contain the host and x-amz-date headers.
+        :param bytes payload:           The body of the request.
+        :param str amzdate:             The date of the request in YYYYMMDD'T'HHMMSS'Z' format.
+        :rtype: str
+        """
+        url_parsed = urlparse(url)
+        datestamp = amzdate[:8]  # Date w/o time, used in credential scope
+
+        # Step 1. Create a canonical request
+        canonical_headers = sorted((key.lower(), ' '.join(value.split())) for key, value in headers.items())
+        signed_headers = ';'.join(key for key, _ in canonical_headers)
+        if payload:
+            if not isinstance(payload, bytes):
+                payload = payload.encode('utf-8')
+            payload_hash = hashlib.sha256(payload).hexdigest()
+        else:
+            payload_hash = EMPTY_PAYLOAD_HASH
+
+        canonical_request = '\n'.join([
+            method,
+            quote(url_parsed.path or '/'),
+            get_canonical_querystring(url_parsed.query),
+            ''.join('%s:%s\n' % header for header in canonical_headers),
+            signed_headers,
+            payload_hash,
+        ])
+
+        # Step 2. Create a string to sign
+        credential_scope = '%s/%s/%s/aws4_request' % (datestamp, self.region, self.service)
+        string_to_sign = '\n'.join([
+            ALGORITHM,
+            amzdate,
+            credential_scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+        ])
+
+        # Step 3. Calculate the signature
+        signing_key = get_signing_key(self.secret_key, datestamp, self.region, self.service)
+        signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        return '%s Credential=%s/%s, SignedHeaders=%s, Signature=%s' % (ALGORITHM, self.access_key, credential_scope, signed_headers, signature)
+
+    def sign(self, request, now=None):
+        """ Sign the request by adding the x-amz-date and Authorization headers.
+
+        :param requests.PreparedRequest request:        A prepared request that should be signed.
+        :param datetime.datetime now:                   The time of the request, in UTC.
+        """
+        if now is None:
+            now = datetime.datetime.utcnow()
+        amzdate = now.strftime('%Y%m%dT%H%M%SZ')
+
+        headers = {
+            'host': urlparse(request.url).netloc,
+            'x-amz-date': amzdate,
+        }
+        authorization = self.get_authorization(request.method, request.url, headers, request.body, amzdate)
+
+        # Step 4. Add the signature to the request
+        request.headers.update({
+            'x-amz-date': amzdate,
+            'Authorization': authorization,
+        })
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+""" Latency budgets for listings. This module doesn't need requests, so route modules can use it without loading the HTTP stack. """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from resources.lib import kodiutils
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_LISTING_BUDGET = 10  # Seconds
+
+_BUDGETS = threading.local()
+_METRICS = {}  # Only used when the metrics can't be stored in the cache
+_METRICS_LOCK = threading.Lock()
+
+
+class latency_budget:  # pylint: disable=invalid-name
+    """ Limit the time all requests in a block of code may take. Can be used as a context manager or as a decorator.
+
+    The timeouts of the requests are capped to the remaining budget by the transport, and when the budget is used up, requests fail right
+    away with a BudgetExceededException. The API clients then fall back to their expired cache.
+    """
+
+    def __init__(self, name, seconds=None):
+        """ Initialise object
+        :type name: str
+        :type seconds: float
+        """
+        self.name = name
+        self.seconds = seconds
+        self._start = None
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with latency_budget(self.name, self.seconds):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __enter__(self):
+        seconds = self.seconds
+        if seconds is None:
+            seconds = kodiutils.get_setting_int('listing_budget', DEFAULT_LISTING_BUDGET)
+        self._start = time.time()
+        _get_budget_stack().append(self._start + seconds)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        deadline = _get_budget_stack().pop()
+        elapsed = time.time() - self._start
+        exceeded = time.time() > deadline
+
+        metrics = _add_call(self.name, exceeded)
+        if exceeded:
+            _LOGGER.warning('Latency budget of %s exceeded after %.2f seconds (%d of %d calls)', self.name, elapsed, metrics['exceeded'],
+                            metrics['calls'])
+        else:
+            _LOGGER.debug('Latency budget of %s: %.2f of %.2f seconds used', self.name, elapsed, deadline - self._start)
+        return False
+
+
+@contextmanager
+def use_deadline(deadline):
+    """ Apply the deadline of a latency budget in the current thread. The budgets are kept per thread, so worker threads need to be
+    passed the deadline of the thread that started them. The call is only counted in the metrics of the original budget.
+    :type deadline: float
+    """
+    if deadline is None:
+        yield
+        return
+
+    stack = _get_budget_stack()
+    stack.append(deadline)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def get_deadline():
+    """ Return the time at which the current latency budget is used up, or None when there is no budget.
+    :rtype float
+    """
+    stack = _get_budget_stack()
+    if not stack:
+        return None
+    return min(stack)
+
+
+def get_remaining_budget():
+    """ Return the number of seconds that are left in the current latency budget, or None when there is no budget.
+    :rtype float
+    """
+    deadline = get_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def get_metrics():
+    """ Return how often each latency budget was used, and how often it was exceeded. The metrics are kept in the cache, so they
+    include the earlier invocations of the add-on.
+    :rtype dict[str, dict[str, int]]
+    """
+    try:
+        from resources.lib import context
+        metrics = context.get_cache().get_budget_metrics()
+    except Exception as exc:  # pylint: disable=broad-except
+        _LOGGER.debug('Could not read the metrics of the latency budgets: %s', exc)
+        metrics = {}
+
+    with _METRICS_LOCK:
+        for name, fallback in _METRICS.items():
+            totals = metrics.setdefault(name, {'calls': 0, 'exceeded': 0})
+            totals['calls'] += fallback['calls']
+            totals['exceeded'] += fallback['exceeded']
+    return metrics
+
+
+def _add_call(name, exceeded):
+    """ Count a call of a latency budget in the cache, or in memory when the cache can't be used. A metric should never make a
+    listing fail.
+    :type name: str
+    :type exceeded: bool
+    :rtype dict[str, int]
+    """
+    try:
+        from resources.lib import context
+        return context.get_cache().add_budget_call(name, exceeded)
+    except Exception as exc:  # pylint: disable=broad-except
+        _LOGGER.debug('Could not store the metrics of latency budget %s: %s', name, exc)
+
+    with _METRICS_LOCK:
+        metrics = _METRICS.setdefault(name, {'calls': 0, 'exceeded': 0})
+        metrics['calls'] += 1
+        if exceeded:
+            metrics['exceeded'] += 1
+        return dict(metrics)
+
+
+def _get_budget_stack():
+    """ Return the deadlines of the latency budgets of the current thread """
+    if not hasattr(_BUDGETS, 'stack'):
+        _BUDGETS.stack = []
+    return _BUDGETS.stack
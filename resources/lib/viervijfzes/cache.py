@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+""" Cache storage """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NotModified(Exception):
+    """ Is thrown when a conditional request tells us that the cached item is still valid. """
+
+
+class CacheStore:
+    """ Interface of a cache backend. Keys are lists of strings, values are JSON serializable. """
+
+    def get(self, key, allow_expired=False):
+        """ Get an item from the cache.
+        :type key: list[str]
+        :type allow_expired: bool
+        :rtype any
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl, etag=None, last_modified=None):
+        """ Store an item in the cache, together with the validators of the response it came from.
+        :type key: list[str]
+        :type value: any
+        :type ttl: int
+        :type etag: str
+        :type last_modified: str
+        """
+        raise NotImplementedError
+
+    def touch(self, key, ttl):
+        """ Extend the lifetime of an item in the cache.
+        :type key: list[str]
+        :type ttl: int
+        """
+        raise NotImplementedError
+
+    def get_validators(self, key):
+        """ Get the ETag and Last-Modified validators of an item in the cache, even if it has expired.
+        :type key: list[str]
+        :rtype tuple[str, str]
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """ Remove an item from the cache.
+        :type key: list[str]
+        """
+        raise NotImplementedError
+
+    def delete_prefix(self, key):
+        """ Remove all items that start with the specified key.
+        :type key: list[str]
+        """
+        raise NotImplementedError
+
+    def purge(self, max_age=0):
+        """ Remove all items that have been expired for more than max_age seconds.
+        :type max_age: int
+        """
+        raise NotImplementedError
+
+    def queue_refresh(self, key):
+        """ Mark an item to be refreshed in the background.
+        :type key: list[str]
+        """
+        raise NotImplementedError
+
+    def pop_refresh_queue(self):
+        """ Return and clear the items that are marked to be refreshed.
+        :rtype list[list[str]]
+        """
+        raise NotImplementedError
+
+    def add_budget_call(self, name, exceeded):
+        """ Count a call of a latency budget, and return how often it was used and exceeded in total.
+        :type name: str
+        :type exceeded: bool
+        :rtype dict[str, int]
+        """
+        raise NotImplementedError
+
+    def get_budget_metrics(self):
+        """ Return how often each latency budget was used, and how often it was exceeded.
+        :rtype dict[str, dict[str, int]]
+        """
+        raise NotImplementedError
+
+
+class SqliteCacheStore(CacheStore):
+    """ A cache backend that keeps all items in a single SQLite database """
+
+    DB_FILE = 'cache.sqlite'
+    SCHEMA_VERSION = 4
+
+    def __init__(self, cache_path):
+        """ Initialise object. The database is only opened on first use.
+        :type cache_path: str
+        """
+        self._cache_path = cache_path
+        self._conn = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _make_key(key):
+        """ Convert a key to the string we store in the database """
+        # Use the same naming as the JSON files of the old file based cache
+        return '.'.join(key).replace('/', '_')
+
+    def _connect(self):
+        """ Open the database and create or upgrade the schema when needed """
+        if self._conn is not None:
+            return self._conn
+
+        if not os.path.exists(self._cache_path):
+            os.makedirs(self._cache_path)
+
+        conn = sqlite3.connect(os.path.join(self._cache_path, self.DB_FILE), timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < self.SCHEMA_VERSION:
+            with conn:
+                self._migrate(conn, version)
+                conn.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+
+        self._conn = conn
+        return conn
+
+    def _migrate(self, conn, version):
+        """ Upgrade the schema one version at a time, starting from the specified version """
+        if version < 1:
+            # Version 1 replaced the JSON files of the old file based cache
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, '
+                         'value TEXT NOT NULL, '
+                         'expiry INTEGER NOT NULL, '
+                         'etag TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expiry ON cache (expiry)')
+            self._migrate_json_files(conn)
+        if version < 2:
+            # Version 2 added the queue of items to refresh in the background
+            conn.execute('CREATE TABLE IF NOT EXISTS refresh_queue ('
+                         'key TEXT PRIMARY KEY, '
+                         'queued INTEGER NOT NULL)')
+        if version < 3:
+            # Version 3 added the Last-Modified validator
+            conn.execute('ALTER TABLE cache ADD COLUMN last_modified TEXT')
+        if version < 4:
+            # Version 4 added the metrics of the latency budgets
+            conn.execute('CREATE TABLE IF NOT EXISTS budget_metrics ('
+                         'name TEXT PRIMARY KEY, '
+                         'calls INTEGER NOT NULL, '
+                         'exceeded INTEGER NOT NULL)')
+
+    def _migrate_json_files(self, conn):
+        """ Import the JSON files of the old file based cache and remove them """
+        for filename in os.listdir(self._cache_path):
+            if not filename.endswith('.json'):
+                continue
+            fullpath = os.path.join(self._cache_path, filename)
+            try:
+                with open(fullpath, 'r') as fdesc:
+                    value = fdesc.read()
+                json.loads(value)  # Validate
+                expiry = int(os.stat(fullpath).st_mtime)  # The old cache stored the deadline in the mtime
+                conn.execute('INSERT OR REPLACE INTO cache (key, value, expiry) VALUES (?, ?, ?)', (filename[:-len('.json')], value, expiry))
+            except (IOError, OSError, TypeError, ValueError) as exc:
+                _LOGGER.warning('Could not migrate cache file %s: %s', filename, exc)
+            try:
+                os.unlink(fullpath)
+            except OSError:
+                pass
+        _LOGGER.debug('Migrated the JSON file cache to %s', self.DB_FILE)
+
+    def get(self, key, allow_expired=False):
+        """ Get an item from the cache """
+        with self._lock:
+            if allow_expired:
+                row = self._connect().execute('SELECT value FROM cache WHERE key = ?', (self._make_key(key),)).fetchone()
+            else:
+                row = self._connect().execute('SELECT value FROM cache WHERE key = ? AND expiry >= ?', (self._make_key(key), int(time.time()))).fetchone()
+
+        if row is None:
+            return None
+
+        try:
+            _LOGGER.debug('Fetching %s from cache', self._make_key(key))
+            return json.loads(row[0])
+        except (ValueError, TypeError):
+            return None
+
+    def set(self, key, value, ttl, etag=None, last_modified=None):
+        """ Store an item in the cache """
+        _LOGGER.debug('Storing to cache as %s', self._make_key(key))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO cache (key, value, expiry, etag, last_modified) VALUES (?, ?, ?, ?, ?)',
+                             (self._make_key(key), json.dumps(value), int(time.time()) + ttl, etag, last_modified))
+
+    def touch(self, key, ttl):
+        """ Extend the lifetime of an item in the cache """
+        _LOGGER.debug('Extending the lifetime of %s', self._make_key(key))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('UPDATE cache SET expiry = ? WHERE key = ?', (int(time.time()) + ttl, self._make_key(key)))
+
+    def get_validators(self, key):
+        """ Get the ETag and Last-Modified validators of an item in the cache, even if it has expired """
+        with self._lock:
+            row = self._connect().execute('SELECT etag, last_modified FROM cache WHERE key = ?', (self._make_key(key),)).fetchone()
+
+        if row is None:
+            return None, None
+
+        return row[0], row[1]
+
+    def delete(self, key):
+        """ Remove an item from the cache """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM cache WHERE key = ?', (self._make_key(key),))
+
+    def delete_prefix(self, key):
+        """ Remove all items that start with the specified key """
+        prefix = self._make_key(key) + '.'
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM cache WHERE substr(key, 1, ?) = ?', (len(prefix), prefix))
+
+    def purge(self, max_age=0):
+        """ Remove all items that have been expired for more than max_age seconds """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM cache WHERE expiry < ?', (int(time.time()) - max_age,))
+
+    def queue_refresh(self, key):
+        """ Mark an item to be refreshed in the background """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO refresh_queue (key, queued) VALUES (?, ?)', (json.dumps(key), int(time.time())))
+
+    def pop_refresh_queue(self):
+        """ Return and clear the items that are marked to be refreshed """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                rows = conn.execute('SELECT key FROM refresh_queue ORDER BY queued, rowid').fetchall()
+                conn.execute('DELETE FROM refresh_queue')
+        return [json.loads(row[0]) for row in rows]
+
+    def add_budget_call(self, name, exceeded):
+        """ Count a call of a latency budget, and return how often it was used and exceeded in total """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO budget_metrics (name, calls, exceeded) VALUES (?, 0, 0)', (name,))
+                conn.execute('UPDATE budget_metrics SET calls = calls + 1, exceeded = exceeded + ? WHERE name = ?', (int(exceeded), name))
+                row = conn.execute('SELECT calls, exceeded FROM budget_metrics WHERE name = ?', (name,)).fetchone()
+        return {'calls': row[0], 'exceeded': row[1]}
+
+    def get_budget_metrics(self):
+        """ Return how often each latency budget was used, and how often it was exceeded """
+        with self._lock:
+            rows = self._connect().execute('SELECT name, calls, exceeded FROM budget_metrics').fetchall()
+        return {row[0]: {'calls': row[1], 'exceeded': row[2]} for row in rows}
+
+    def close(self):
+        """ Close the database """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -6,31 +6,19 @@ from __future__ import absolute_import, division, unicode_literals
 import hashlib
 import json
 import logging
-import os
-import re
 import time
 from datetime import datetime
 
-import requests
-
-from resources.lib import kodiutils
 from resources.lib.kodiutils import STREAM_DASH, STREAM_HLS, html_to_kodi
-from resources.lib.viervijfzes import ResolvedStream
-
-try:  # Python 3
-    from html import unescape
-except ImportError:  # Python 2
-    from HTMLParser import HTMLParser
-
-    unescape = HTMLParser().unescape
+from resources.lib.viervijfzes import ResolvedStream, extractor
+from resources.lib.viervijfzes.cache import NotModified, SqliteCacheStore
 
 _LOGGER = logging.getLogger(__name__)
 
 CACHE_AUTO = 1  # Allow to use the cache, and query the API if no cache is available
 CACHE_ONLY = 2  # Only use the cache, don't use the API
 CACHE_PREVENT = 3  # Don't use the cache
-
-PROXIES = kodiutils.get_proxies()
+CACHE_STALE_OK = 4  # Allow to use expired cache, and queue a refresh for the background service
 
 
 class UnavailableException(Exception):
@@ -48,9 +36,12 @@ class GeoblockedException(Exception):
 class Program:
     """ Defines a Program. """
 
+    __slots__ = ('uuid', 'path', 'channel', 'title', 'description', 'aired', 'poster', 'thumb', 'fanart', 'clips', 'my_list',
+                 '_playlists', '_seasons', '_episodes')
+
     def __init__(self, uuid=None, path=None, channel=None, title=None, description=None, aired=None, poster=None, thumb=None, fanart=None, seasons=None,
                  episodes=None,
-                 clips=None, my_list=False):
+                 clips=None, my_list=False, playlists=None):
         """
         :type uuid: str
         :type path: str
@@ -65,6 +56,7 @@ class Program:
         :type episodes: list[Episode]
         :type clips: list[Episode]
         :type my_list: bool
+        :type playlists: list[dict]
         """
         self.uuid = uuid
         self.path = path
@@ -75,18 +67,59 @@ class Program:
         self.poster = poster
         self.thumb = thumb
         self.fanart = fanart
-        self.seasons = seasons
-        self.episodes = episodes
         self.clips = clips
         self.my_list = my_list
 
+        # The seasons and episodes are only parsed from the playlists when they are needed
+        self._playlists = playlists
+        self._seasons = seasons
+        self._episodes = episodes
+
+    @property
+    def seasons(self):
+        """ The seasons of this program.
+        :rtype dict[int, Season]
+        """
+        if self._seasons is None and self._playlists is not None:
+            self._seasons = ContentApi._parse_seasons_data(self._playlists)  # pylint: disable=protected-access
+        return self._seasons
+
+    @seasons.setter
+    def seasons(self, value):
+        self._seasons = value
+
+    @property
+    def episodes(self):
+        """ The episodes of this program.
+        :rtype list[Episode]
+        """
+        if self._episodes is None and self._playlists is not None:
+            self._episodes = ContentApi._parse_episodes_data(self._playlists)  # pylint: disable=protected-access
+        return self._episodes
+
+    @episodes.setter
+    def episodes(self, value):
+        self._episodes = value
+
+    @property
+    def season_count(self):
+        """ The number of seasons of this program, without parsing them.
+        :rtype int
+        """
+        if self._seasons is None and self._playlists is not None:
+            return sum(1 for playlist in self._playlists if playlist.get('episodes'))
+        return len(self._seasons) if self._seasons else 0
+
     def __repr__(self):
-        return "%r" % self.__dict__
+        # Don't parse the seasons and episodes just to show them
+        return "%r" % {name.lstrip('_'): getattr(self, name) for name in self.__slots__ if name != '_playlists'}
 
 
 class Season:
     """ Defines a Season. """
 
+    __slots__ = ('uuid', 'path', 'channel', 'title', 'description', 'number')
+
     def __init__(self, uuid=None, path=None, channel=None, title=None, description=None, number=None):
         """
         :type uuid: str
@@ -105,12 +138,15 @@ class Season:
         self.number = number
 
     def __repr__(self):
-        return "%r" % self.__dict__
+        return "%r" % {name: getattr(self, name) for name in self.__slots__}
 
 
 class Episode:
     """ Defines an Episode. """
 
+    __slots__ = ('uuid', 'nodeid', 'path', 'channel', 'program_title', 'title', 'description', 'thumb', 'duration', 'season', 'season_uuid',
+                 'number', 'rating', 'aired', 'expiry', 'stream', 'islongform')
+
     def __init__(self, uuid=None, nodeid=None, path=None, channel=None, program_title=None, title=None, description=None, thumb=None, duration=None,
                  season=None, season_uuid=None, number=None, rating=None, aired=None, expiry=None, stream=None, islongform=False):
         """
@@ -151,12 +187,14 @@ class Episode:
         self.islongform = islongform
 
     def __repr__(self):
-        return "%r" % self.__dict__
+        return "%r" % {name: getattr(self, name) for name in self.__slots__}
 
 
 class Category:
     """ Defines a Category. """
 
+    __slots__ = ('uuid', 'channel', 'title', 'programs', 'episodes')
+
     def __init__(self, uuid=None, channel=None, title=None, programs=None, episodes=None):
         """
         :type uuid: str
@@ -172,7 +210,46 @@ class Category:
         self.episodes = episodes
 
     def __repr__(self):
-        return "%r" % self.__dict__
+        return "%r" % {name: getattr(self, name) for name in self.__slots__}
+
+
+class CatalogIndex:
+    """ An index of all programs for fast lookups by path, uuid or brand. """
+
+    def __init__(self, programs):
+        """
+        :type programs: list[Program]
+        """
+        self.programs = programs
+        self._by_path = {}
+        self._by_uuid = {}
+        self._by_brand = {}
+        for program in programs:
+            self._by_path[program.path] = program
+            if program.uuid:
+                self._by_uuid[program.uuid] = program
+            self._by_brand.setdefault(program.channel, []).append(program)
+
+    def get_by_path(self, path):
+        """ Return the program with the specified path.
+        :type path: str
+        :rtype Program
+        """
+        return self._by_path.get(path.lstrip('/'))
+
+    def get_by_uuid(self, uuid):
+        """ Return the program with the specified uuid.
+        :type uuid: str
+        :rtype Program
+        """
+        return self._by_uuid.get(uuid)
+
+    def get_by_brand(self, brand):
+        """ Return the programs of the specified brand.
+        :type brand: str
+        :rtype list[Program]
+        """
+        return self._by_brand.get(brand, [])
 
 
 class ContentApi:
@@ -180,11 +257,22 @@ class ContentApi:
     SITE_URL = 'https://www.goplay.be'
     API_GOPLAY = 'https://api.goplay.be'
 
-    def __init__(self, auth=None, cache_path=None):
-        """ Initialise object """
-        self._session = requests.session()
+    PROGRAMS_TTL = 30 * 60  # 30 minutes
+
+    def __init__(self, auth=None, cache_path=None, cache=None):
+        """ Initialise object
+        :type auth: resources.lib.viervijfzes.auth.AuthApi|callable
+        :type cache_path: str
+        :type cache: resources.lib.viervijfzes.cache.CacheStore
+        """
+        self._session = None  # We use the shared session, unless one is set here
         self._auth = auth
-        self._cache_path = cache_path
+        if cache is None and cache_path:
+            cache = SqliteCacheStore(cache_path)
+        self._cache = cache
+        self._catalog_index = None
+        self._catalog_index_expiry = 0
+        self._validators = {}
 
     def get_programs(self, channel=None, cache=CACHE_AUTO):
         """ Get a list of all programs of the specified channel.
@@ -192,40 +280,56 @@ class ContentApi:
         :type cache: str
         :rtype list[Program]
         """
+        data = self._get_programs_data(cache=cache)
+
+        return [
+            self._parse_program_data(record) for record in data if not channel or record['pageInfo']['brand'] == channel
+        ]
+
+    def _get_programs_data(self, cache=CACHE_AUTO):
+        """ Get the raw data of all programs.
+        :type cache: str
+        :rtype list[dict]
+        """
 
         def update():
             """ Fetch the program listing by scraping """
             # Load webpage
-            raw_html = self._get_url(self.SITE_URL + '/programmas')
+            raw_html = self._get_url(self.SITE_URL + '/programmas', cache_key=['programs'])
 
             # Parse programs
-            regex_programs = re.compile(r'data-program="(?P<json>[^"]+)"', re.DOTALL)
-
-            data = [
-                json.loads(unescape(item.group('json')))
-                for item in regex_programs.finditer(raw_html)
-            ]
+            data = extractor.extract_programs_data(raw_html)
 
             if not data:
                 raise Exception('No programs found')
 
             return data
 
+        # The catalog index needs to be rebuilt when we have fetched a new listing
+        if cache == CACHE_PREVENT:
+            self._catalog_index = None
+
         # Fetch listing from cache or update if needed
-        data = self._handle_cache(key=['programs'], cache_mode=cache, update=update, ttl=30 * 60)  # 30 minutes
-        if not data:
-            return []
+        data = self._handle_cache(key=['programs'], cache_mode=cache, update=update, ttl=self.PROGRAMS_TTL)
 
-        if channel:
-            programs = [
-                self._parse_program_data(record) for record in data if record['pageInfo']['brand'] == channel
-            ]
-        else:
-            programs = [
-                self._parse_program_data(record) for record in data
-            ]
+        return data or []
+
+    def get_catalog_index(self, cache=CACHE_AUTO):
+        """ Get an index of all programs. The index is kept in memory for as long as the program listing is valid.
+        :type cache: int
+        :rtype CatalogIndex
+        """
+        if self._catalog_index is not None and time.time() < self._catalog_index_expiry and cache != CACHE_PREVENT:
+            return self._catalog_index
 
-        return programs
+        programs = self.get_programs(cache=cache)
+        if not programs:
+            # Don't keep an empty index, we might have been called with CACHE_ONLY
+            return CatalogIndex([])
+
+        self._catalog_index = CatalogIndex(programs)
+        self._catalog_index_expiry = time.time() + self.PROGRAMS_TTL
+        return self._catalog_index
 
     def get_program(self, path, extract_clips=False, cache=CACHE_AUTO):
         """ Get a Program object from the specified page.
@@ -240,16 +344,16 @@ class ContentApi:
 
         def update():
             """ Fetch the program metadata by scraping """
-            # Fetch webpage
-            page = self._get_url(self.SITE_URL + '/' + path)
+            # Fetch webpage. We need the html to extract the clips, so we can't use a conditional request then.
+            page = self._get_url(self.SITE_URL + '/' + path, cache_key=None if extract_clips else ['program', path])
 
             # Store a copy in the parent's raw_html var.
             raw_html[0] = page
 
             # Extract JSON
-            regex_program = re.compile(r'data-hero="([^"]+)', re.DOTALL)
-            json_data = unescape(regex_program.search(page).group(1))
-            data = json.loads(json_data)['data']
+            data = extractor.extract_hero_data(page)
+            if data is None:
+                raise Exception('No program found')
 
             return data
 
@@ -262,7 +366,7 @@ class ContentApi:
 
         # Also extract clips if we did a real HTTP call
         if extract_clips and raw_html[0]:
-            clips = self._extract_videos(raw_html[0])
+            clips = self._extract_videos(extractor.extract_teasers(raw_html[0]))
             program.clips = clips
 
         return program
@@ -279,12 +383,12 @@ class ContentApi:
         def update():
             """ Fetch the program metadata """
             # Fetch webpage
-            result = self._get_url(self.SITE_URL + '/api/program/%s' % uuid)
+            result = self._get_url(self.SITE_URL + '/api/program/%s' % uuid, cache_key=['program_uuid', uuid])
             data = json.loads(result)
             return data
 
         # Fetch listing from cache or update if needed
-        data = self._handle_cache(key=['program', uuid], cache_mode=cache, update=update)
+        data = self._handle_cache(key=['program_uuid', uuid], cache_mode=cache, update=update)
         if not data:
             return None
 
@@ -301,35 +405,20 @@ class ContentApi:
 
         def update():
             """ Fetch the program metadata by scraping """
-            # Load webpage
-            page = self._get_url(self.SITE_URL + '/' + path)
-
-            program_json = None
-            episode_json = None
+            # Load webpage. When it's not modified, we keep the cached episode, including the video JSON.
+            page = self._get_url(self.SITE_URL + '/' + path, cache_key=['episode', path])
 
             # Extract video JSON by looking for a data-video tag
             # This is not present on every page
-            regex_video_data = re.compile(r'data-video="([^"]+)"', re.DOTALL)
-            result = regex_video_data.search(page)
-            if result:
-                video_id = json.loads(unescape(result.group(1)))['id']
-                video_json_data = self._get_url('%s/web/v1/videos/short-form/%s' % (self.API_GOPLAY, video_id))
+            video_data = extractor.extract_video_data(page)
+            if video_data:
+                video_json_data = self._get_url('%s/web/v1/videos/short-form/%s' % (self.API_GOPLAY, video_data['id']))
                 video_json = json.loads(video_json_data)
                 return {'video': video_json}
 
-            # Extract program JSON
-            regex_program = re.compile(r'data-hero="([^"]+)', re.DOTALL)
-            result = regex_program.search(page)
-            if result:
-                program_json_data = unescape(result.group(1))
-                program_json = json.loads(program_json_data)['data']
-
-            # Extract episode JSON
-            regex_episode = re.compile(r'<script type="application/json" data-drupal-selector="drupal-settings-json">(.*?)</script>', re.DOTALL)
-            result = regex_episode.search(page)
-            if result:
-                episode_json_data = unescape(result.group(1))
-                episode_json = json.loads(episode_json_data)
+            # Extract program JSON and episode JSON
+            program_json = extractor.extract_hero_data(page)
+            episode_json = extractor.extract_drupal_settings(page)
 
             return {'program': program_json, 'episode': episode_json}
 
@@ -360,7 +449,7 @@ class ContentApi:
         :rtype: ResolvedStream
         """
         mode = 'long-form' if islongform else 'short-form'
-        response = self._get_url(self.API_GOPLAY + '/web/v1/videos/%s/%s' % (mode, uuid), authentication='Bearer %s' % self._auth.get_token())
+        response = self._get_url(self.API_GOPLAY + '/web/v1/videos/%s/%s' % (mode, uuid), authentication=self._get_authentication())
         data = json.loads(response)
 
         if not data:
@@ -421,14 +510,50 @@ class ContentApi:
 
         def update():
             """ Fetch the content tree """
-            response = self._get_url(self.SITE_URL + '/api/content_tree')
-            return json.loads(response)
+            response = self._get_url(self.SITE_URL + '/api/content_tree', cache_key=['content_tree'])
+            data = json.loads(response)
+
+            # Also update the category index, so it stays in sync with the content tree
+            self._set_cache(['category_index'], self._build_category_index(data), ttl=5 * 60)
+
+            return data
 
         # Fetch listing from cache or update if needed
         data = self._handle_cache(key=['content_tree'], cache_mode=cache, update=update, ttl=5 * 60)  # 5 minutes
 
         return data
 
+    def get_category_index(self, cache=CACHE_AUTO):
+        """ Get the program ids of each category of the content tree.
+        :type cache: int
+        :rtype dict[str, set[str]]
+        """
+
+        def update():
+            """ Build the category index from the content tree """
+            return self._build_category_index(self.get_program_tree(cache=cache))
+
+        data = self._handle_cache(key=['category_index'], cache_mode=cache, update=update, ttl=5 * 60)  # 5 minutes
+        if not data:
+            return {}
+
+        return {category_id: set(program_ids) for category_id, program_ids in data.items()}
+
+    @staticmethod
+    def _build_category_index(content_tree):
+        """ Group the program ids of the content tree by category.
+        :type content_tree: dict
+        :rtype dict[str, list[str]]
+        """
+        if not content_tree:
+            return {}
+
+        category_index = {}
+        for program_id, program in content_tree.get('programs', {}).items():
+            # The keys of a JSON object are always strings
+            category_index.setdefault(str(program.get('category')), []).append(program_id)
+        return category_index
+
     def get_popular_programs(self, brand=None):
         """ Get a list of popular programs.
         :rtype list[Program]
@@ -439,11 +564,7 @@ class ContentApi:
             response = self._get_url(self.SITE_URL + '/api/programs/popular')
         data = json.loads(response)
 
-        programs = []
-        for program in data:
-            programs.append(self._parse_program_data(program))
-
-        return programs
+        return [self._parse_program_data(program) for program in data]
 
     def get_categories(self):
         """ Return a list of categories.
@@ -463,61 +584,71 @@ class ContentApi:
         :type category_id: int
         :rtype list[Program]
         """
-        content_tree = self.get_program_tree()
-
         # Find out all the program_id's of the requested category
-        program_ids = [key for key, value in content_tree.get('programs').items() if value.get('category') == category_id]
+        program_ids = self.get_category_index().get(str(category_id), set())
+        if not program_ids:
+            return []
 
-        # Filter out the list of all programs to only keep the one of the requested category
-        return [program for program in self.get_programs() if program.uuid in program_ids]
+        # Only parse the programs of the requested category
+        return [self._parse_program_data(record) for record in self._get_programs_data() if record.get('id') in program_ids]
 
-    def get_recommendation_categories(self):
+    def get_recommendation_categories(self, cache=CACHE_AUTO):
         """ Get a list of all categories.
+        :type cache: int
         :rtype list[Category]
         """
-        # Load all programs
-        all_programs = self.get_programs()
 
-        # Load webpage
-        raw_html = self._get_url(self.SITE_URL)
+        def update():
+            """ Fetch the categories by scraping the homepage """
+            # Load webpage
+            raw_html = self._get_url(self.SITE_URL)
+
+            return [
+                {
+                    'title': category_title,
+                    'teasers': [teaser._asdict() for teaser in extractor.extract_teasers(article_html)],
+                }
+                for category_title, article_html in extractor.extract_categories(raw_html)
+            ]
 
-        # Categories regexes
-        regex_articles = re.compile(r'<article[^>]+>(.*?)</article>', re.DOTALL)
-        regex_category = re.compile(r'<h2.*?>(.*?)</h2>(?:.*?<div class="visually-hidden">(.*?)</div>)?', re.DOTALL)
+        # Fetch the categories from cache or update if needed
+        data = self._handle_cache(key=['recommendations'], cache_mode=cache, update=update, ttl=5 * 60)  # 5 minutes
+        if not data:
+            return []
+
+        # Load all programs
+        catalog_index = self.get_catalog_index()
 
         categories = []
-        for result in regex_articles.finditer(raw_html):
-            article_html = result.group(1)
-
-            match_category = regex_category.search(article_html)
-            category_title = None
-            if match_category:
-                category_title = match_category.group(1).strip()
-                if match_category.group(2):
-                    category_title += ' [B]%s[/B]' % match_category.group(2).strip()
-
-            if category_title:
-                # Extract programs and lookup in all_programs so we have more metadata
-                programs = []
-                for program in self._extract_programs(article_html):
-                    try:
-                        rich_program = next(rich_program for rich_program in all_programs if rich_program.path == program.path)
-                        programs.append(rich_program)
-                    except StopIteration:
-                        programs.append(program)
-
-                episodes = self._extract_videos(article_html)
-
-                categories.append(
-                    Category(uuid=hashlib.md5(category_title.encode('utf-8')).hexdigest(), title=category_title, programs=programs, episodes=episodes))
+        for item in data:
+            teasers = [extractor.Teaser(**teaser) for teaser in item['teasers']]
+
+            # Extract programs and lookup in the catalog so we have more metadata
+            programs = [
+                catalog_index.get_by_path(program.path) or program
+                for program in self._extract_programs(teasers)
+            ]
+
+            episodes = self._extract_videos(teasers)
+
+            categories.append(
+                Category(uuid=hashlib.md5(item['title'].encode('utf-8')).hexdigest(), title=item['title'], programs=programs, episodes=episodes))
 
         return categories
 
+    def get_recommendation_category(self, uuid, cache=CACHE_AUTO):
+        """ Get a category of the recommendations.
+        :type uuid: str
+        :type cache: int
+        :rtype Category
+        """
+        return next((category for category in self.get_recommendation_categories(cache=cache) if category.uuid == uuid), None)
+
     def get_mylist(self):
         """ Get the content of My List
         :rtype list[Program]
         """
-        data = self._get_url(self.API_GOPLAY + '/my-list', authentication='Bearer %s' % self._auth.get_token())
+        data = self._get_url(self.API_GOPLAY + '/my-list', authentication=self._get_authentication())
         result = json.loads(data)
 
         items = []
@@ -534,114 +665,58 @@ class ContentApi:
 
     def mylist_add(self, program_id):
         """ Add a program on My List """
-        self._post_url(self.API_GOPLAY + '/my-list', data={'programId': program_id}, authentication='Bearer %s' % self._auth.get_token())
+        self._post_url(self.API_GOPLAY + '/my-list', data={'programId': program_id}, authentication=self._get_authentication())
 
     def mylist_del(self, program_id):
         """ Remove a program on My List """
-        self._delete_url(self.API_GOPLAY + '/my-list-item', params={'programId': program_id}, authentication='Bearer %s' % self._auth.get_token())
+        self._delete_url(self.API_GOPLAY + '/my-list-item', params={'programId': program_id}, authentication=self._get_authentication())
 
     @staticmethod
-    def _extract_programs(html):
-        """ Extract Programs from HTML code
-        :type html: str
+    def _extract_programs(teasers):
+        """ Extract Programs from the teasers of a page
+        :type teasers: list[resources.lib.viervijfzes.extractor.Teaser]
         :rtype list[Program]
         """
-        # Item regexes
-        regex_item = re.compile(r'<a[^>]+?href="(?P<path>[^"]+)"[^>]+?>'
-                                r'.*?<h3 class="poster-teaser__title">(?P<title>[^<]*)</h3>.*?data-background-image="(?P<image>.*?)".*?'
-                                r'</a>', re.DOTALL)
-
-        # Extract items
-        programs = []
-        for item in regex_item.finditer(html):
-            path = item.group('path')
-            if path.startswith('/video'):
-                continue
-
-            # Program
-            programs.append(Program(
-                path=path.lstrip('/'),
-                title=unescape(item.group('title')),
-                poster=unescape(item.group('image')),
-            ))
-
-        return programs
+        return [
+            Program(
+                path=teaser.path.lstrip('/'),
+                title=teaser.title,
+                poster=teaser.image,
+            )
+            for teaser in teasers
+            if teaser.kind == 'poster' and not teaser.path.startswith('/video') and teaser.image is not None
+        ]
 
     @staticmethod
-    def _extract_videos(html):
-        """ Extract videos from HTML code
-        :type html: str
+    def _extract_videos(teasers):
+        """ Extract videos from the teasers of a page
+        :type teasers: list[resources.lib.viervijfzes.extractor.Teaser]
         :rtype list[Episode]
         """
-        # Item regexes
-        regex_item = re.compile(r'<a[^>]+?href="(?P<path>[^"]+)"[^>]+?>.*?</a>', re.DOTALL)
-
-        regex_episode_program = re.compile(r'<h3 class="episode-teaser__subtitle">([^<]*)</h3>')
-        regex_episode_title = re.compile(r'<(?:div|h3) class="(?:poster|card|image|episode)-teaser__title">(?:<span>)?([^<]*)(?:</span>)?</(?:div|h3)>')
-        regex_episode_duration = re.compile(r'data-duration="([^"]*)"')
-        regex_episode_video_id = re.compile(r'data-video-id="([^"]*)"')
-        regex_episode_image = re.compile(r'data-background-image="([^"]*)"')
-        regex_episode_badge = re.compile(r'<div class="(?:poster|card|image|episode)-teaser__badge badge">([^<]*)</div>')
-
-        # Extract items
         episodes = []
-        for item in regex_item.finditer(html):
-            item_html = item.group(0)
-            path = item.group('path')
-
-            # Extract title
-            try:
-                title = unescape(regex_episode_title.search(item_html).group(1))
-            except AttributeError:
-                continue
-
+        for teaser in teasers:
             # This is not a video
-            if not path.startswith('/video'):
+            if teaser.title is None or not teaser.path.startswith('/video'):
                 continue
 
-            try:
-                episode_program = regex_episode_program.search(item_html).group(1)
-            except AttributeError:
-                _LOGGER.warning('Found no episode_program for %s', title)
-                episode_program = None
-
-            try:
-                episode_duration = int(regex_episode_duration.search(item_html).group(1))
-            except AttributeError:
-                _LOGGER.warning('Found no episode_duration for %s', title)
-                episode_duration = None
-
-            try:
-                episode_video_id = regex_episode_video_id.search(item_html).group(1)
-            except AttributeError:
-                _LOGGER.warning('Found no episode_video_id for %s', title)
-                episode_video_id = None
-
-            try:
-                episode_image = unescape(regex_episode_image.search(item_html).group(1))
-            except AttributeError:
-                _LOGGER.warning('Found no episode_image for %s', title)
-                episode_image = None
-
-            try:
-                episode_badge = unescape(regex_episode_badge.search(item_html).group(1))
-            except AttributeError:
-                episode_badge = None
+            for field in ('program', 'duration', 'video_id', 'image'):
+                if getattr(teaser, field) is None:
+                    _LOGGER.warning('Found no episode_%s for %s', field, teaser.title)
 
-            description = title
-            if episode_badge:
-                description += "\n\n[B]%s[/B]" % episode_badge
+            description = teaser.title
+            if teaser.badge:
+                description += "\n\n[B]%s[/B]" % teaser.badge
 
             # Episode
             episodes.append(Episode(
-                path=path.lstrip('/'),
+                path=teaser.path.lstrip('/'),
                 channel='',  # TODO
-                title=title,
+                title=teaser.title,
                 description=html_to_kodi(description),
-                duration=episode_duration,
-                uuid=episode_video_id,
-                thumb=episode_image,
-                program_title=episode_program,
+                duration=teaser.duration,
+                uuid=teaser.video_id,
+                thumb=teaser.image,
+                program_title=teaser.program,
             ))
 
         return episodes
@@ -663,10 +738,18 @@ class ContentApi:
             poster=data.get('images').get('poster'),
             thumb=data.get('images').get('teaser'),
             fanart=data.get('images').get('teaser'),
+            playlists=data.get('playlists', []),
         )
 
-        # Create Season info
-        program.seasons = {
+        return program
+
+    @staticmethod
+    def _parse_seasons_data(playlists):
+        """ Parse the Seasons of the playlists of a Program.
+        :type playlists: list[dict]
+        :rtype dict[int, Season]
+        """
+        return {
             key: Season(
                 uuid=playlist.get('id'),
                 path=playlist.get('link').lstrip('/'),
@@ -675,18 +758,21 @@ class ContentApi:
                 description=html_to_kodi(playlist.get('description')),
                 number=playlist.get('episodes')[0].get('seasonNumber'),  # You did not see this
             )
-            for key, playlist in enumerate(data.get('playlists', [])) if playlist.get('episodes')
+            for key, playlist in enumerate(playlists) if playlist.get('episodes')
         }
 
-        # Create Episodes info
-        program.episodes = [
+    @staticmethod
+    def _parse_episodes_data(playlists):
+        """ Parse the Episodes of the playlists of a Program.
+        :type playlists: list[dict]
+        :rtype list[Episode]
+        """
+        return [
             ContentApi._parse_episode_data(episode, playlist.get('id'))
-            for playlist in data.get('playlists', [])
+            for playlist in playlists
             for episode in playlist.get('episodes')
         ]
 
-        return program
-
     @staticmethod
     def _parse_episode_data(data, season_uuid=None):
         """ Parse the Episode JSON.
@@ -698,7 +784,7 @@ class ContentApi:
             episode_number = data.get('episodeNumber')
         else:
             # The episodeNumber can be absent
-            match = re.compile(r'\d+$').search(data.get('title'))
+            match = extractor.REGEX_EPISODE_NUMBER.search(data.get('title'))
             if match:
                 episode_number = match.group(0)
             else:
@@ -766,37 +852,58 @@ class ContentApi:
 
         return '%s|%s|%s|%s' % (key_url, header, key_value, response_value)
 
-    def _get_url(self, url, params=None, authentication=None):
+    def _get_url(self, url, params=None, authentication=None, cache_key=None):
         """ Makes a GET request for the specified URL.
+        When a cache_key is passed, we make a conditional request with the validators of the cached item, and raise NotModified when it
+        is still valid.
         :type url: str
         :type authentication: str
+        :type cache_key: list[str]
         :rtype str
         """
-        if authentication:
-            response = self._session.get(url, params=params, headers={
-                'authorization': authentication,
-            }, proxies=PROXIES)
-        else:
-            response = self._session.get(url, params=params, proxies=PROXIES)
+        headers = {'authorization': authentication} if authentication else {}
+        if cache_key and self._cache is not None:
+            etag, last_modified = self._cache.get_validators(cache_key)
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = self._get_session().get(url, params=params, headers=headers)
+
+        if response.status_code == 304:
+            raise NotModified()
 
         if response.status_code != 200:
             _LOGGER.error(response.text)
             raise Exception('Could not fetch data')
 
+        if cache_key:
+            # Keep the validators until the response is stored in the cache
+            self._validators['.'.join(cache_key)] = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
         return response.text
 
+    def _get_session(self):
+        """ Return the shared HTTP session. We only load the HTTP stack when we make our first request, not for listings from the cache. """
+        if self._session is not None:
+            return self._session
+        from resources.lib.viervijfzes import transport
+        return transport.get_session()
+
+    def _get_authentication(self):
+        """ Return the authorization header. The auth can also be a function that returns it, so we only load it for authenticated calls. """
+        auth = self._auth() if callable(self._auth) else self._auth
+        return 'Bearer %s' % auth.get_token()
+
     def _post_url(self, url, params=None, data=None, authentication=None):
         """ Makes a POST request for the specified URL.
         :type url: str
         :type authentication: str
         :rtype str
         """
-        if authentication:
-            response = self._session.post(url, params=params, json=data, headers={
-                'authorization': authentication,
-            }, proxies=PROXIES)
-        else:
-            response = self._session.post(url, params=params, json=data, proxies=PROXIES)
+        headers = {'authorization': authentication} if authentication else {}
+        response = self._get_session().post(url, params=params, json=data, headers=headers)
 
         if response.status_code not in (200, 201):
             _LOGGER.error(response.text)
@@ -810,12 +917,8 @@ class ContentApi:
         :type authentication: str
         :rtype str
         """
-        if authentication:
-            response = self._session.delete(url, params=params, headers={
-                'authorization': authentication,
-            }, proxies=PROXIES)
-        else:
-            response = self._session.delete(url, params=params, proxies=PROXIES)
+        headers = {'authorization': authentication} if authentication else {}
+        response = self._get_session().delete(url, params=params, headers=headers)
 
         if response.status_code != 200:
             _LOGGER.error(response.text)
@@ -823,13 +926,43 @@ class ContentApi:
 
         return response.text
 
+    def refresh_queued(self):
+        """ Refresh the cache of the items that were served expired with CACHE_STALE_OK. """
+        if self._cache is None:
+            return
+
+        for key in self._cache.pop_refresh_queue():
+            _LOGGER.debug('Refreshing queued key %s', '.'.join(key))
+            try:
+                if key[0] == 'programs':
+                    self.get_programs(cache=CACHE_PREVENT)
+                elif key[0] == 'content_tree':
+                    self.get_program_tree(cache=CACHE_PREVENT)
+                elif key[0] == 'program':
+                    self.get_program(key[1], cache=CACHE_PREVENT)
+                elif key[0] == 'program_uuid':
+                    self.get_program_by_uuid(key[1], cache=CACHE_PREVENT)
+                elif key[0] == 'episode':
+                    self.get_episode(key[1], cache=CACHE_PREVENT)
+                else:
+                    _LOGGER.warning('Unknown key %s in the refresh queue', '.'.join(key))
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.warning('Could not refresh queued key %s: %s', '.'.join(key), exc)
+
     def _handle_cache(self, key, cache_mode, update, ttl=30 * 24 * 60 * 60):
         """ Fetch something from the cache, and update if needed """
-        if cache_mode in [CACHE_AUTO, CACHE_ONLY]:
+        if cache_mode in [CACHE_AUTO, CACHE_ONLY, CACHE_STALE_OK]:
             # Try to fetch from cache
             data = self._get_cache(key)
             if data is None and cache_mode == CACHE_ONLY:
                 return None
+            if data is None and cache_mode == CACHE_STALE_OK:
+                # Serve expired data right away, and let the background service refresh it
+                data = self._get_cache(key, allow_expired=True)
+                if data is not None:
+                    _LOGGER.debug('Using expired data for key %s and queueing a refresh', '.'.join(key))
+                    self._cache.queue_refresh(key)
+                    return data
         else:
             data = None
 
@@ -841,6 +974,11 @@ class ContentApi:
                 if data:
                     # Store fresh response in cache
                     self._set_cache(key, data, ttl)
+            except NotModified:
+                # Our cached data is still valid, so we only need to extend its lifetime
+                _LOGGER.debug('Data for key %s is not modified', '.'.join(key))
+                self._cache.touch(key, ttl)
+                data = self._get_cache(key, allow_expired=True)
             except Exception as exc:  # pylint: disable=broad-except
                 _LOGGER.warning('Something went wrong when refreshing live data: %s. Using expired cached values.', exc)
                 data = self._get_cache(key, allow_expired=True)
@@ -849,35 +987,13 @@ class ContentApi:
 
     def _get_cache(self, key, allow_expired=False):
         """ Get an item from the cache """
-        filename = ('.'.join(key) + '.json').replace('/', '_')
-        fullpath = os.path.join(self._cache_path, filename)
-
-        if not os.path.exists(fullpath):
-            return None
-
-        if not allow_expired and os.stat(fullpath).st_mtime < time.time():
+        if self._cache is None:
             return None
-
-        with open(fullpath, 'r') as fdesc:
-            try:
-                _LOGGER.debug('Fetching %s from cache', filename)
-                value = json.load(fdesc)
-                return value
-            except (ValueError, TypeError):
-                return None
+        return self._cache.get(key, allow_expired=allow_expired)
 
     def _set_cache(self, key, data, ttl):
         """ Store an item in the cache """
-        filename = ('.'.join(key) + '.json').replace('/', '_')
-        fullpath = os.path.join(self._cache_path, filename)
-
-        if not os.path.exists(self._cache_path):
-            os.makedirs(self._cache_path)
-
-        with open(fullpath, 'w') as fdesc:
-            _LOGGER.debug('Storing to cache as %s', filename)
-            json.dump(data, fdesc)
-
-        # Set TTL by modifying modification date
-        deadline = int(time.time()) + ttl
-        os.utime(fullpath, (deadline, deadline))
+        etag, last_modified = self._validators.pop('.'.join(key), (None, None))
+        if self._cache is None:
+            return
+        self._cache.set(key, data, ttl, etag=etag, last_modified=last_modified)
@@ -5,13 +5,11 @@ from __future__ import absolute_import, division, unicode_literals
 
 import json
 import logging
+import time
 from datetime import datetime, timedelta
 
-import dateutil.parser
-import dateutil.tz
-import requests
-
-from resources.lib import kodiutils
+from resources.lib.viervijfzes.budget import get_deadline, use_deadline
+from resources.lib.viervijfzes.cache import NotModified, SqliteCacheStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,12 +31,14 @@ GENRE_MAPPING = {
     'Voetbal': 0x43,
 }
 
-PROXIES = kodiutils.get_proxies()
-
 
 class EpgProgram:
     """ Defines a Program in the EPG. """
 
+    __slots__ = ('channel', 'program_title', 'episode_title', 'episode_title_original', 'number', 'season', 'genre', 'start',
+                 'won_id', 'won_program_id', 'program_description', 'description', 'duration', 'program_url', 'video_url', 'thumb',
+                 'airing', 'genre_id')
+
     # pylint: disable=invalid-name
     def __init__(self, channel, program_title, episode_title, episode_title_original, number, season, genre, start,
                  won_id, won_program_id, program_description, description, duration, program_url, video_url, thumb,
@@ -67,7 +67,7 @@ class EpgProgram:
             self.genre_id = None
 
     def __repr__(self):
-        return "%r" % self.__dict__
+        return "%r" % {name: getattr(self, name) for name in self.__slots__}
 
 
 class EpgApi:
@@ -82,36 +82,137 @@ class EpgApi:
 
     EPG_NO_BROADCAST = 'Geen uitzending'
 
-    def __init__(self):
-        """ Initialise object """
-        self._session = requests.session()
+    MAX_WORKERS = 4
+
+    TTL_PAST = 30 * 24 * 60 * 60  # 30 days, the guide of the past doesn't change anymore
+    TTL_YESTERDAY = 6 * 60 * 60  # 6 hours, videos of yesterday's broadcasts are still being added
+    TTL_TODAY = 15 * 60  # 15 minutes
+    TTL_FUTURE = 6 * 60 * 60  # 6 hours
 
-    def get_epg(self, channel, date):
+    def __init__(self, cache_path=None, cache=None):
+        """ Initialise object
+        :type cache_path: str
+        :type cache: resources.lib.viervijfzes.cache.CacheStore
+        """
+        self._session = None  # We use the shared session, unless one is set here
+
+        if cache is None and cache_path:
+            cache = SqliteCacheStore(cache_path)
+        self._cache = cache
+
+    def get_epg(self, channel, date, refresh=False):
         """ Returns the EPG for the specified channel and date.
         :type channel: str
         :type date: str
+        :type refresh: bool
         :rtype list[EpgProgram]
         """
         if channel not in self.EPG_ENDPOINTS:
             raise Exception('Unknown channel %s' % channel)
 
-        if date is None:
-            # Fetch today when no date is specified
-            date = datetime.today().strftime('%Y-%m-%d')
-        elif date == 'yesterday':
-            date = (datetime.today() + timedelta(days=-1)).strftime('%Y-%m-%d')
-        elif date == 'today':
-            date = datetime.today().strftime('%Y-%m-%d')
-        elif date == 'tomorrow':
-            date = (datetime.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+        date = self._resolve_date(date)
+        key = ['epg', channel, date]
 
         # Request the epg data
-        response = self._get_url(self.EPG_ENDPOINTS.get(channel).format(date=date))
-        data = json.loads(response)
+        data = None if refresh else self._get_cache(key)
+        if data is None:
+            try:
+                response, etag, last_modified = self._get_url(self.EPG_ENDPOINTS.get(channel).format(date=date), cache_key=key)
+                data = json.loads(response)
+                self._set_cache(key, data, self._get_ttl(date), etag=etag, last_modified=last_modified)
+            except NotModified:
+                # Our cached data is still valid, so we only need to extend its lifetime
+                self._cache.touch(key, self._get_ttl(date))
+                data = self._cache.get(key, allow_expired=True) or []
+            except Exception as exc:  # pylint: disable=broad-except
+                # Fall back to the expired data when we have it, e.g. when the latency budget was exceeded
+                data = self._cache.get(key, allow_expired=True) if self._cache is not None else None
+                if data is None:
+                    raise
+                _LOGGER.warning('Something went wrong when refreshing the EPG: %s. Using expired cached values.', exc)
 
         # Parse the results
         return [self._parse_program(channel, x) for x in data if x.get('program_title') != self.EPG_NO_BROADCAST]
 
+    def get_epg_range(self, channel, start_date, end_date):
+        """ Returns the EPG for the specified channel for all the dates in a range.
+        :type channel: str
+        :type start_date: datetime.date
+        :type end_date: datetime.date
+        :rtype dict[str, list[EpgProgram]]
+        """
+        dates = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end_date - start_date).days + 1)]
+        results = self.get_epg_multiple([(channel, date) for date in dates])
+        return {date: results[(channel, date)] for date in dates}
+
+    def invalidate(self, channel=None, date=None):
+        """ Remove the EPG of the specified channel and date from the cache. Leave one out to invalidate all of them.
+        :type channel: str
+        :type date: str
+        """
+        if self._cache is None:
+            return
+
+        for key in [channel] if channel else self.EPG_ENDPOINTS:
+            if date:
+                self._cache.delete(['epg', key, self._resolve_date(date)])
+            else:
+                self._cache.delete_prefix(['epg', key])
+
+    def get_epg_multiple(self, requests_list, max_workers=MAX_WORKERS):
+        """ Returns the EPG for multiple channels and dates, fetched in parallel.
+        A request that fails results in an empty list, so it doesn't affect the others.
+        :type requests_list: list[tuple[str, str]]
+        :type max_workers: int
+        :rtype dict[tuple[str, str], list[EpgProgram]]
+        """
+        return dict(self.iter_epg_multiple(requests_list, max_workers))
+
+    def iter_epg_multiple(self, requests_list, max_workers=MAX_WORKERS):
+        """ Yields the EPG for multiple channels and dates in the order of the requests, while they are fetched in parallel.
+        A request that fails results in an empty list, so it doesn't affect the others.
+        :type requests_list: collections.Iterable[tuple[str, str]]
+        :type max_workers: int
+        :rtype collections.Iterable[tuple[tuple[str, str], list[EpgProgram]]]
+        """
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        from itertools import islice
+
+        # The latency budget is kept per thread, so we pass its deadline to the workers
+        deadline = get_deadline()
+
+        def fetch(request):
+            """ Fetch the EPG of one channel and date """
+            channel, date = request
+            fetch_start = time.time()
+            try:
+                with use_deadline(deadline):
+                    programs = self.get_epg(channel, date)
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.warning('Could not fetch the EPG of %s for %s: %s', channel, date, exc)
+                programs = []
+            _LOGGER.debug('Fetched the EPG of %s for %s in %.3fs (%d programs)', channel, date, time.time() - fetch_start, len(programs))
+            return request, programs
+
+        start = time.time()
+        count = 0
+        requests_iter = iter(requests_list)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # We only submit a window of requests, so the results don't pile up in memory when the caller is slower than the fetching
+            pending = deque(executor.submit(fetch, request) for request in islice(requests_iter, max_workers))
+            try:
+                while pending:
+                    result = pending.popleft().result()
+                    pending.extend(executor.submit(fetch, request) for request in islice(requests_iter, 1))
+                    count += 1
+                    yield result
+            finally:
+                # Don't start the requests that are still waiting when the caller stops early
+                for future in pending:
+                    future.cancel()
+        _LOGGER.debug('Fetched %d EPG days in %.3fs', count, time.time() - start)
+
     @staticmethod
     def _parse_program(channel, data):
         """ Parse the EPG JSON data to a EpgProgram object.
@@ -122,8 +223,10 @@ class EpgApi:
         duration = int(data.get('duration')) if data.get('duration') else None
 
         # Check if this broadcast is currently airing
-        timestamp = datetime.now().replace(tzinfo=dateutil.tz.gettz('CET'))
-        start = datetime.fromtimestamp(data.get('timestamp')).replace(tzinfo=dateutil.tz.gettz('CET'))
+        import dateutil.tz
+        timezone = dateutil.tz.gettz('CET')
+        timestamp = datetime.now().replace(tzinfo=timezone)
+        start = datetime.fromtimestamp(data.get('timestamp')).replace(tzinfo=timezone)
         if duration:
             airing = bool(start <= timestamp < (start + timedelta(seconds=duration)))
         else:
@@ -164,6 +267,8 @@ class EpgApi:
         :rtype: EpgProgram
         """
         # Parse to a real datetime
+        import dateutil.parser
+        import dateutil.tz
         timestamp = dateutil.parser.parse(timestamp).replace(tzinfo=dateutil.tz.gettz('CET'))
 
         # Load guide info for this date
@@ -176,14 +281,78 @@ class EpgApi:
 
         return None
 
-    def _get_url(self, url):
+    @staticmethod
+    def _resolve_date(date):
+        """ Convert a date or a relative day to a date string.
+        :type date: str
+        :rtype str
+        """
+        if date is None or date == 'today':
+            # Fetch today when no date is specified
+            return datetime.today().strftime('%Y-%m-%d')
+        if date == 'yesterday':
+            return (datetime.today() + timedelta(days=-1)).strftime('%Y-%m-%d')
+        if date == 'tomorrow':
+            return (datetime.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+        return date
+
+    def _get_ttl(self, date):
+        """ Return how long the EPG of the specified date can be cached.
+        :type date: str
+        :rtype int
+        """
+        today = datetime.today().strftime('%Y-%m-%d')
+        if date == today:
+            return self.TTL_TODAY
+        if date > today:
+            return self.TTL_FUTURE
+        if date == self._resolve_date('yesterday'):
+            return self.TTL_YESTERDAY
+        return self.TTL_PAST
+
+    def _get_cache(self, key):
+        """ Get an item from the cache """
+        if self._cache is None:
+            return None
+        return self._cache.get(key)
+
+    def _set_cache(self, key, data, ttl, etag=None, last_modified=None):
+        """ Store an item in the cache """
+        if self._cache is None:
+            return
+        self._cache.set(key, data, ttl, etag=etag, last_modified=last_modified)
+
+    def _get_session(self):
+        """ Return the shared HTTP session. We only load the HTTP stack when we make our first request.
+        :rtype requests.Session
+        """
+        if self._session is not None:
+            return self._session
+        from resources.lib.viervijfzes import transport
+        return transport.get_session()
+
+    def _get_url(self, url, cache_key=None):
         """ Makes a GET request for the specified URL.
+        When a cache_key is passed, we make a conditional request with the validators of the cached item, and raise NotModified when it
+        is still valid.
         :type url: str
-        :rtype str
+        :type cache_key: list[str]
+        :rtype tuple[str, str, str]
         """
-        response = self._session.get(url, proxies=PROXIES)
+        headers = {}
+        if cache_key and self._cache is not None:
+            etag, last_modified = self._cache.get_validators(cache_key)
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = self._get_session().get(url, headers=headers)
+
+        if response.status_code == 304:
+            raise NotModified()
 
         if response.status_code != 200:
             raise Exception('Could not fetch data')
 
-        return response.text
+        return response.text, response.headers.get('ETag'), response.headers.get('Last-Modified')
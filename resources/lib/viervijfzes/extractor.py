@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+""" HTML extraction for the GoPlay website """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import logging
+import re
+from collections import namedtuple
+
+try:  # Python 3
+    from html import unescape
+except ImportError:  # Python 2
+    from HTMLParser import HTMLParser
+
+    unescape = HTMLParser().unescape
+
+_LOGGER = logging.getLogger(__name__)
+
+REGEX_PROGRAM_DATA = re.compile(r'data-program="(?P<json>[^"]+)"', re.DOTALL)
+REGEX_HERO_DATA = re.compile(r'data-hero="([^"]+)', re.DOTALL)
+REGEX_VIDEO_DATA = re.compile(r'data-video="([^"]+)"', re.DOTALL)
+REGEX_DRUPAL_SETTINGS = re.compile(r'<script type="application/json" data-drupal-selector="drupal-settings-json">(.*?)</script>', re.DOTALL)
+REGEX_ARTICLE = re.compile(r'<article[^>]+>(.*?)</article>', re.DOTALL)
+REGEX_CATEGORY = re.compile(r'<h2.*?>(.*?)</h2>(?:.*?<div class="visually-hidden">(.*?)</div>)?', re.DOTALL)
+REGEX_EPISODE_NUMBER = re.compile(r'\d+$')
+
+# All the parts of a teaser we are interested in. A teaser starts with an <a> tag and ends with the </a> tag.
+# The alternatives are grouped by their first character, so the regex engine can skip quickly over the rest of the page.
+REGEX_TEASER_TOKENS = re.compile(
+    r'<(?:'
+    r'(?P<start>a\s)'
+    r'|(?P<end>/a>)'
+    r'|h3 class="episode-teaser__subtitle">(?P<program>[^<]*)</h3>'
+    r'|(?:div|h3) class="(?P<kind>poster|card|image|episode)-teaser__title">(?:<span>)?(?P<title>[^<]*)(?:</span>)?</(?:div|h3)>'
+    r'|div class="(?:poster|card|image|episode)-teaser__badge badge">(?P<badge>[^<]*)</div>'
+    r')'
+    r'|h(?<=\sh)ref="(?P<path>[^"]+)"'
+    r'|data-(?:'
+    r'duration="(?P<duration>[^"]*)"'
+    r'|video-id="(?P<video_id>[^"]*)"'
+    r'|background-image="(?P<image>[^"]*)"'
+    r')'
+)
+
+# The kind is the type of teaser, based on the class of its title: poster, card, image or episode
+Teaser = namedtuple('Teaser', ['path', 'kind', 'title', 'duration', 'video_id', 'image', 'badge', 'program'])
+
+
+def extract_teasers(html):
+    """ Extract all teasers from HTML code in a single pass.
+    :type html: str
+    :rtype collections.Iterable[Teaser]
+    """
+    fields = None
+    for match in REGEX_TEASER_TOKENS.finditer(html):
+        token = match.lastgroup
+        if token == 'start':
+            fields = {}
+        elif fields is None:
+            # We are not inside a teaser
+            continue
+        elif token == 'end':
+            if fields.get('path'):
+                yield _create_teaser(fields)
+            fields = None
+        elif token not in fields:
+            # Only keep the first occurrence
+            fields[token] = match.group(token)
+            if token == 'title':
+                fields['kind'] = match.group('kind')
+
+
+def _create_teaser(fields):
+    """ Create a Teaser from the raw fields.
+    :type fields: dict[str, str]
+    :rtype Teaser
+    """
+    try:
+        duration = int(fields['duration'])
+    except (KeyError, ValueError):
+        duration = None
+
+    return Teaser(
+        path=fields['path'],
+        kind=fields.get('kind'),
+        title=unescape(fields['title']) if 'title' in fields else None,
+        duration=duration,
+        video_id=fields.get('video_id'),
+        image=unescape(fields['image']) if 'image' in fields else None,
+        badge=unescape(fields['badge']) if 'badge' in fields else None,
+        program=fields.get('program'),
+    )
+
+
+def extract_programs_data(html):
+    """ Extract the JSON of all the programs on the overview page.
+    :type html: str
+    :rtype list[dict]
+    """
+    return [json.loads(unescape(match.group('json'))) for match in REGEX_PROGRAM_DATA.finditer(html)]
+
+
+def extract_hero_data(html):
+    """ Extract the JSON of the program on a program page.
+    :type html: str
+    :rtype dict
+    """
+    match = REGEX_HERO_DATA.search(html)
+    if not match:
+        return None
+    return json.loads(unescape(match.group(1)))['data']
+
+
+def extract_video_data(html):
+    """ Extract the JSON of the video on a video page. This is not present on every page.
+    :type html: str
+    :rtype dict
+    """
+    match = REGEX_VIDEO_DATA.search(html)
+    if not match:
+        return None
+    return json.loads(unescape(match.group(1)))
+
+
+def extract_drupal_settings(html):
+    """ Extract the Drupal settings JSON of a page.
+    :type html: str
+    :rtype dict
+    """
+    match = REGEX_DRUPAL_SETTINGS.search(html)
+    if not match:
+        return None
+    return json.loads(unescape(match.group(1)))
+
+
+def extract_categories(html):
+    """ Extract the title and the HTML code of the categories on the homepage.
+    :type html: str
+    :rtype collections.Iterable[tuple[str, str]]
+    """
+    for match in REGEX_ARTICLE.finditer(html):
+        article_html = match.group(1)
+
+        match_category = REGEX_CATEGORY.search(article_html)
+        if not match_category:
+            continue
+
+        category_title = match_category.group(1).strip()
+        if match_category.group(2):
+            category_title += ' [B]%s[/B]' % match_category.group(2).strip()
+
+        if category_title:
+            yield category_title, article_html
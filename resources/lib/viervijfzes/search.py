@@ -6,24 +6,33 @@ from __future__ import absolute_import, division, unicode_literals
 import json
 import logging
 
-import requests
-
 from resources.lib import kodiutils
 from resources.lib.viervijfzes.content import CACHE_ONLY, ContentApi, Program
 
 _LOGGER = logging.getLogger(__name__)
 
-PROXIES = kodiutils.get_proxies()
-
 
 class SearchApi:
     """ GoPlay Search API """
     API_ENDPOINT = 'https://api.goplay.be/search'
 
-    def __init__(self):
-        """ Initialise object """
-        self._api = ContentApi(None, cache_path=kodiutils.get_cache_path())
-        self._session = requests.session()
+    def __init__(self, api=None):
+        """ Initialise object
+        :type api: resources.lib.viervijfzes.content.ContentApi
+        """
+        if api is None:
+            api = ContentApi(None, cache_path=kodiutils.get_cache_path())
+        self._api = api
+        self._session = None  # We use the shared session, unless one is set here
+
+    def _get_session(self):
+        """ Return the shared HTTP session. We only load the HTTP stack when we search.
+        :rtype requests.Session
+        """
+        if self._session is not None:
+            return self._session
+        from resources.lib.viervijfzes import transport
+        return transport.get_session()
 
     def search(self, query):
         """ Get the stream URL to use for this video.
@@ -33,24 +42,26 @@ class SearchApi:
         if not query:
             return []
 
-        response = self._session.post(
+        response = self._get_session().post(
             self.API_ENDPOINT,
             json={
                 "query": query,
                 "page": 0,
                 "mode": "programs"
-            },
-            proxies=PROXIES
+            }
         )
         response.raise_for_status()
 
         data = json.loads(response.text)
 
+        # Only use the programs we already know, searching should not trigger a full catalog download
+        catalog_index = self._api.get_catalog_index(cache=CACHE_ONLY)
+
         results = []
         for hit in data['hits']['hits']:
             if hit['_source']['bundle'] == 'program':
                 path = hit['_source']['url'].split('/')[-1]
-                program = self._api.get_program(path, cache=CACHE_ONLY)
+                program = catalog_index.get_by_path(path) or self._api.get_program(path, cache=CACHE_ONLY)
                 if program:
                     results.append(program)
                 else:
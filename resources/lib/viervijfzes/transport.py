@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+""" Shared HTTP transport for all API clients """
+
+from __future__ import absolute_import, division, unicode_literals
+
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from resources.lib import kodiutils
+from resources.lib.viervijfzes.budget import get_remaining_budget
+
+_LOGGER = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = 8  # The number of hosts we keep a connection pool for
+POOL_MAXSIZE = 8  # The number of connections we keep alive per host
+DEFAULT_TIMEOUT = (5, 15)  # Connect and read timeout in seconds, can be changed in the settings
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_FORCELIST = (500, 502, 503, 504)
+
+_SESSION = None
+_SESSION_PROXIES = None
+_SESSION_LOCK = threading.Lock()
+
+
+class BudgetExceededException(requests.exceptions.Timeout):
+    """ Is thrown when a request is made after the latency budget has been used up """
+
+
+class BudgetRetry(Retry):
+    """ A retry policy that doesn't retry within a latency budget. Every attempt can take up to the remaining budget, so retrying would
+    make the request take longer than the budget allows. """
+
+    def increment(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        """ Return a new retry policy after a failed attempt, or raise a MaxRetryError when we should give up """
+        if get_remaining_budget() is not None:
+            return super(BudgetRetry, self.new(total=0)).increment(*args, **kwargs)
+        return super(BudgetRetry, self).increment(*args, **kwargs)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """ An HTTPAdapter that uses a default timeout when none is passed, and that respects the latency budget """
+
+    def __init__(self, *args, **kwargs):
+        """ Initialise object
+        :type timeout: tuple[float, float]
+        """
+        self.timeout = kwargs.pop('timeout', DEFAULT_TIMEOUT)
+        super(TimeoutHTTPAdapter, self).__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        """ Send a request, using the default timeout if needed """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+
+        remaining = get_remaining_budget()
+        if remaining is not None:
+            if remaining <= 0:
+                raise BudgetExceededException('Latency budget exceeded, not requesting %s' % request.url, request=request)
+            kwargs['timeout'] = _cap_timeout(kwargs['timeout'], remaining)
+
+        return super(TimeoutHTTPAdapter, self).send(request, **kwargs)
+
+
+def _cap_timeout(timeout, maximum):
+    """ Make sure the connect and read timeout are not larger than maximum.
+    :type timeout: float|tuple[float, float]
+    :type maximum: float
+    :rtype tuple[float, float]
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return min(connect, maximum), min(read, maximum)
+
+
+def get_timeout():
+    """ Return the connect and read timeout from the settings.
+    :rtype tuple[int, int]
+    """
+    return (kodiutils.get_setting_int('http_timeout_connect', DEFAULT_TIMEOUT[0]),
+            kodiutils.get_setting_int('http_timeout_read', DEFAULT_TIMEOUT[1]))
+
+
+def get_session():
+    """ Return the session that is shared by all API clients. It's created on first use, and created again when the proxy settings have
+    changed, so API clients should call this for every request instead of keeping the session.
+    :rtype requests.Session
+    """
+    global _SESSION, _SESSION_PROXIES  # pylint: disable=global-statement
+    proxies = kodiutils.get_proxies()
+    with _SESSION_LOCK:
+        if _SESSION is not None and proxies != _SESSION_PROXIES:
+            _LOGGER.debug('The proxy settings have changed')
+            _SESSION.close()
+            _SESSION = None
+        if _SESSION is None:
+            _SESSION = _create_session(proxies)
+            _SESSION_PROXIES = proxies
+        return _SESSION
+
+
+def reset_session():
+    """ Close the shared session, so the next call to get_session creates a new one with the current settings """
+    global _SESSION  # pylint: disable=global-statement
+    kodiutils.invalidate_proxies()
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+def _create_retry():
+    """ Create the retry policy. Only idempotent requests are retried on a server error, but all requests are retried when we could not connect.
+    Requests within a latency budget are not retried.
+    :rtype BudgetRetry
+    """
+    kwargs = {
+        'total': RETRY_TOTAL,
+        'backoff_factor': RETRY_BACKOFF_FACTOR,
+        'status_forcelist': RETRY_STATUS_FORCELIST,
+        'raise_on_status': False,  # Return the last response, our clients check the status code themselves
+    }
+    try:
+        return BudgetRetry(allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, **kwargs)
+    except (AttributeError, TypeError):  # urllib3 < 1.26
+        return BudgetRetry(method_whitelist=Retry.DEFAULT_METHOD_WHITELIST, **kwargs)  # pylint: disable=no-member,unexpected-keyword-arg
+
+
+def _get_accept_encoding():
+    """ Return the encodings we can decode. Brotli is only supported when a brotli module is available.
+    :rtype str
+    """
+    try:
+        import brotli  # pylint: disable=unused-import
+    except ImportError:
+        try:
+            import brotlicffi  # pylint: disable=unused-import
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+
+def _create_session(proxies):
+    """ Create a session with a pooled adapter, default timeouts, retries and the proxy settings of Kodi.
+    :type proxies: dict
+    :rtype requests.Session
+    """
+    session = requests.Session()
+
+    adapter = TimeoutHTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=_create_retry(), timeout=get_timeout())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    session.headers['Accept-Encoding'] = _get_accept_encoding()
+
+    if proxies:
+        session.proxies.update(proxies)
+
+    _LOGGER.debug('Created a new HTTP session')
+    return session
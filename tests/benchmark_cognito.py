@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+""" Benchmark of a token refresh with CognitoIdp, without the network round trip.
+
+Run with: python -m tests.benchmark_cognito
+"""
+
+# pylint: disable=missing-docstring,protected-access
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import timeit
+
+from resources.lib.viervijfzes.auth import AuthApi
+from resources.lib.viervijfzes.aws.cognito_idp import CognitoIdp
+
+
+class FakeResponse:
+    text = json.dumps({'AuthenticationResult': {'IdToken': 'id-token'}})
+
+
+class FakeSession:
+    @staticmethod
+    def post(*args, **kwargs):  # pylint: disable=unused-argument
+        return FakeResponse()
+
+
+def refresh(eager):
+    idp_client = CognitoIdp(AuthApi.COGNITO_POOL_ID, AuthApi.COGNITO_CLIENT_ID)
+    if eager:
+        # This is what the constructor used to do
+        _ = idp_client.large_a_value
+    idp_client._session = FakeSession()
+    return idp_client.renew_token('refresh-token')
+
+
+def main(repeat=5, number=50):
+    for name, eager in (('eager', True), ('lazy', False)):
+        best = min(timeit.repeat(lambda eager=eager: refresh(eager), repeat=repeat, number=number))
+        print('%-6s %8.3f ms per token refresh' % (name, best / number * 1000))
+
+
+if __name__ == '__main__':
+    main()
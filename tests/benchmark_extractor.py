@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+""" Micro-benchmark of the HTML extractor against the previous regex based implementation.
+
+The fixture is a small handwritten page with the markup of the goplay.be teasers, not a saved copy of the real homepage, so the timings
+only give an indication. The runs vary by about 10%, which is as large as the difference between both implementations.
+
+Run with: python -m tests.benchmark_extractor
+"""
+
+# pylint: disable=missing-docstring,protected-access
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import re
+import timeit
+
+from resources.lib.viervijfzes import extractor
+from resources.lib.viervijfzes.content import ContentApi
+from tests.test_extractor import load_fixture
+
+try:  # Python 3
+    from html import unescape
+except ImportError:  # Python 2
+    from HTMLParser import HTMLParser
+
+    unescape = HTMLParser().unescape
+
+
+def legacy_extract_programs(html):
+    """ The implementation of ContentApi._extract_programs before the extractor module """
+    regex_item = re.compile(r'<a[^>]+?href="(?P<path>[^"]+)"[^>]+?>'
+                            r'.*?<h3 class="poster-teaser__title">(?P<title>[^<]*)</h3>.*?data-background-image="(?P<image>.*?)".*?'
+                            r'</a>', re.DOTALL)
+
+    programs = []
+    for item in regex_item.finditer(html):
+        path = item.group('path')
+        if path.startswith('/video'):
+            continue
+        programs.append((path.lstrip('/'), unescape(item.group('title')), unescape(item.group('image'))))
+    return programs
+
+
+def legacy_extract_videos(html):
+    """ The implementation of ContentApi._extract_videos before the extractor module """
+    regex_item = re.compile(r'<a[^>]+?href="(?P<path>[^"]+)"[^>]+?>.*?</a>', re.DOTALL)
+
+    regex_episode_program = re.compile(r'<h3 class="episode-teaser__subtitle">([^<]*)</h3>')
+    regex_episode_title = re.compile(r'<(?:div|h3) class="(?:poster|card|image|episode)-teaser__title">(?:<span>)?([^<]*)(?:</span>)?</(?:div|h3)>')
+    regex_episode_duration = re.compile(r'data-duration="([^"]*)"')
+    regex_episode_video_id = re.compile(r'data-video-id="([^"]*)"')
+    regex_episode_image = re.compile(r'data-background-image="([^"]*)"')
+
+    def search(regex, item_html):
+        match = regex.search(item_html)
+        return match.group(1) if match else None
+
+    episodes = []
+    for item in regex_item.finditer(html):
+        item_html = item.group(0)
+        path = item.group('path')
+        title = search(regex_episode_title, item_html)
+        if title is None or not path.startswith('/video'):
+            continue
+        duration = search(regex_episode_duration, item_html)
+        image = search(regex_episode_image, item_html)
+        episodes.append((
+            path.lstrip('/'),
+            unescape(title),
+            int(duration) if duration else None,
+            search(regex_episode_video_id, item_html),
+            unescape(image) if image else None,
+            search(regex_episode_program, item_html),
+        ))
+    return episodes
+
+
+def legacy_parse(html):
+    """ Parse the categories of the homepage like get_recommendation_categories did """
+    return [
+        (legacy_extract_programs(article_html), legacy_extract_videos(article_html))
+        for _, article_html in extractor.extract_categories(html)
+    ]
+
+
+def parse(html):
+    """ Parse the categories of the homepage like get_recommendation_categories does """
+    result = []
+    for _, article_html in extractor.extract_categories(html):
+        teasers = list(extractor.extract_teasers(article_html))
+        programs = ContentApi._extract_programs(teasers)
+        episodes = ContentApi._extract_videos(teasers)
+        result.append((
+            [(program.path, program.title, program.poster) for program in programs],
+            [(episode.path, episode.title, episode.duration, episode.uuid, episode.thumb, episode.program_title) for episode in episodes],
+        ))
+    return result
+
+
+def main(repeat=5, number=20, size=50):
+    # Don't measure the warnings about missing fields
+    logging.disable(logging.WARNING)
+
+    # Repeat the handwritten fixture, so the page is about as large as the real homepage
+    html = load_fixture('goplay_home.html') * size
+
+    assert legacy_parse(html) == parse(html)
+
+    for name, func in (('legacy', legacy_parse), ('extractor', parse)):
+        timings = timeit.repeat(lambda func=func: func(html), repeat=repeat, number=number)
+        print('%-10s %8.2f ms per page, %.2f ms at worst (%d bytes)' % (name, min(timings) / number * 1000, max(timings) / number * 1000, len(html)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+""" Memory benchmark of the slotted models against the same models with a __dict__.
+
+Run with: python -m tests.benchmark_models
+"""
+
+# pylint: disable=missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import gc
+import tracemalloc
+from datetime import datetime
+
+from resources.lib.kodiutils import TitleItem
+from resources.lib.viervijfzes.content import Episode, Program, Season
+from resources.lib.viervijfzes.epg import EpgProgram
+
+
+def without_slots(cls):
+    """ Create a copy of a model that stores its attributes in a __dict__, like the models did before """
+    return type(cls.__name__, (object,), {'__init__': cls.__init__})
+
+
+def load_catalog(program_cls, season_cls, episode_cls, programs=400, seasons=3, episodes=20):
+    """ Create the models of a full catalog """
+    catalog = []
+    for program in range(programs):
+        catalog.append(program_cls(uuid='program-%d' % program, path='program-%d' % program, channel='Play4', title='Program %d' % program,
+                                   aired=datetime.now(), poster='poster.jpg', thumb='thumb.jpg', fanart='fanart.jpg'))
+        for season in range(seasons):
+            catalog.append(season_cls(uuid='season-%d-%d' % (program, season), path='season', channel='Play4', title='Season %d' % season,
+                                      number=season))
+            for episode in range(episodes):
+                catalog.append(episode_cls(uuid='episode-%d-%d-%d' % (program, season, episode), path='video', channel='Play4',
+                                           title='Episode %d' % episode, duration=2700, season=season, number=episode, aired=datetime.now()))
+    return catalog
+
+
+def load_epg(epg_cls, channels=4, days=10, programs=40):
+    """ Create the models of a 10-day EPG """
+    return [
+        epg_cls('Play4', 'Program', 'Episode', None, 1, 1, 'Reality', datetime.now(), 1, 1, 'Description', 'Description', 3600,
+                'program', 'video', 'thumb.jpg', False)
+        for _ in range(channels * days * programs)
+    ]
+
+
+def load_listing(title_item_cls, items=2000):
+    """ Create the TitleItems of a large listing """
+    return [title_item_cls('Title %d' % item, path='plugin://', info_dict={}, art_dict={}) for item in range(items)]
+
+
+def measure(func, *args):
+    """ Return the number of objects and the number of bytes that were allocated by func """
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(result), size
+
+
+def main():
+    total_dict = total_slots = 0
+    for name, func, slotted, legacy in (
+            ('catalog', load_catalog, (Program, Season, Episode), (without_slots(Program), without_slots(Season), without_slots(Episode))),
+            ('epg', load_epg, (EpgProgram,), (without_slots(EpgProgram),)),
+            ('listing', load_listing, (TitleItem,), (without_slots(TitleItem),)),
+    ):
+        count, size_dict = measure(func, *legacy)
+        _, size_slots = measure(func, *slotted)
+        total_dict += size_dict
+        total_slots += size_slots
+        print('%-8s %6d objects: %6.1f kB -> %6.1f kB (%4.0f -> %4.0f bytes per object)' % (
+            name, count, size_dict / 1024, size_slots / 1024, size_dict / count, size_slots / count))
+
+    print('total             %7.1f kB -> %6.1f kB (%.0f%% saved)' % (total_dict / 1024, total_slots / 1024, 100 - total_slots * 100 / total_dict))
+
+
+if __name__ == '__main__':
+    main()
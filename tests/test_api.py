@@ -5,16 +5,61 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
 import logging
+import shutil
+import tempfile
 import unittest
 
 import resources.lib.kodiutils as kodiutils
 from resources.lib.viervijfzes import ResolvedStream
 from resources.lib.viervijfzes.auth import AuthApi
+from resources.lib.viervijfzes.cache import SqliteCacheStore
 from resources.lib.viervijfzes.content import ContentApi, Program, Episode, CACHE_PREVENT, Category
+from tests.test_extractor import load_fixture
 
 _LOGGER = logging.getLogger(__name__)
 
+PROGRAMS = [
+    {'id': 'a1', 'link': '/de-mol', 'title': 'De Mol', 'pageInfo': {'brand': 'play4'}, 'images': {'poster': 'de-mol.jpg'}, 'playlists': [
+        {'id': 's1', 'link': '/de-mol/s1', 'title': 'Seizoen 1', 'pageInfo': {'brand': 'play4'}, 'episodes': [
+            {'uuid': 'e1', 'title': 'Aflevering 1', 'link': '/video/de-mol/s1/1', 'pageInfo': {'brand': 'play4'},
+             'seasonNumber': 1, 'episodeNumber': 1, 'duration': 60, 'createdDate': 0},
+        ]},
+        {'id': 's2', 'link': '/de-mol/s2', 'title': 'Seizoen 2', 'pageInfo': {'brand': 'play4'}, 'episodes': []},
+    ]},
+    {'id': 'b2', 'link': '/gentwest', 'title': 'Gent-West', 'pageInfo': {'brand': 'play5'}, 'images': {}},
+    {'id': 'c3', 'link': '/jani-gaat', 'title': 'Jani gaat', 'pageInfo': {'brand': 'play4'}, 'images': {}},
+]
+
+PROGRAMS_PAGE = ''.join('<div data-program="%s"></div>' % json.dumps(program).replace('"', '&quot;') for program in PROGRAMS)
+
+PROGRAM_PAGE = '<div data-hero="%s"></div>' % json.dumps({'data': PROGRAMS[0]}).replace('"', '&quot;')
+
+CONTENT_TREE = json.dumps({
+    'categories': {'5': 'Reality', '6': 'Fictie'},
+    'programs': {'a1': {'category': 5}, 'b2': {'category': 6}, 'c3': {'category': 5}},
+})
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """ A session that answers every url with the next of its responses """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):  # pylint: disable=unused-argument
+        self.requests.append((url, headers))
+        return self.responses[url].pop(0)
+
 
 class TestApi(unittest.TestCase):
     def __init__(self, *args, **kwargs):
@@ -79,5 +124,115 @@ class TestApi(unittest.TestCase):
         self.assertIsInstance(resolved_stream, ResolvedStream)
 
 
+class TestContentApi(unittest.TestCase):
+    """ Tests for the Content API with the responses of a fake session """
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._cache = SqliteCacheStore(self._path)
+        self._api = ContentApi(cache=self._cache)
+
+    def tearDown(self):
+        self._cache.close()
+        shutil.rmtree(self._path)
+
+    def _set_responses(self, responses):
+        session = FakeSession({ContentApi.SITE_URL + path: pages for path, pages in responses.items()})
+        self._api._session = session  # pylint: disable=protected-access
+        return session
+
+    def test_catalog_index(self):
+        session = self._set_responses({'/programmas': [FakeResponse(200, PROGRAMS_PAGE)]})
+
+        catalog_index = self._api.get_catalog_index()
+        self.assertEqual(len(catalog_index.programs), 3)
+        self.assertEqual(catalog_index.get_by_path('/gentwest').title, 'Gent-West')
+        self.assertEqual(catalog_index.get_by_uuid('c3').path, 'jani-gaat')
+        self.assertEqual([program.uuid for program in catalog_index.get_by_brand('play4')], ['a1', 'c3'])
+        self.assertIsNone(catalog_index.get_by_path('onbekend'))
+        self.assertEqual(catalog_index.get_by_brand('play6'), [])
+
+        # The index is kept in memory, and the listing is not fetched again
+        self.assertIs(self._api.get_catalog_index(), catalog_index)
+        self.assertEqual([program.uuid for program in self._api.get_programs(channel='play5')], ['b2'])
+        self.assertEqual(len(session.requests), 1)
+
+    def test_lazy_program(self):
+        self._set_responses({'/programmas': [FakeResponse(200, PROGRAMS_PAGE)]})
+
+        program = self._api.get_programs()[0]
+        self.assertEqual(program.season_count, 1)
+        self.assertIsNone(program._seasons)  # pylint: disable=protected-access
+        self.assertIsNone(program._episodes)  # pylint: disable=protected-access
+
+        self.assertEqual([season.uuid for season in program.seasons.values()], ['s1'])
+        self.assertEqual([episode.season_uuid for episode in program.episodes], ['s1'])
+        self.assertEqual(program.season_count, 1)
+
+    def test_category_content(self):
+        session = self._set_responses({
+            '/api/content_tree': [FakeResponse(200, CONTENT_TREE)],
+            '/programmas': [FakeResponse(200, PROGRAMS_PAGE)],
+        })
+
+        # The categories come from a dict, so their order isn't fixed
+        self.assertEqual(sorted(category.title for category in self._api.get_categories()), ['Fictie', 'Reality'])
+        self.assertEqual([program.uuid for program in self._api.get_category_content(5)], ['a1', 'c3'])
+        self.assertEqual(self._api.get_category_content(7), [])
+
+        # The category index was built when the content tree was fetched
+        self.assertEqual(self._api.get_category_index(), {'5': {'a1', 'c3'}, '6': {'b2'}})
+        self.assertEqual([url for url, _ in session.requests], [ContentApi.SITE_URL + '/api/content_tree', ContentApi.SITE_URL + '/programmas'])
+
+    def test_recommendations(self):
+        self._set_responses({
+            '': [FakeResponse(200, load_fixture('goplay_home.html'))],
+            '/programmas': [FakeResponse(200, PROGRAMS_PAGE)],
+        })
+
+        categories = self._api.get_recommendation_categories()
+        self.assertEqual([category.title for category in categories], ['Populair [B]Nu op GoPlay[/B]', 'Nieuwste afleveringen'])
+
+        # The programs are looked up in the catalog, the others are kept as they are on the homepage
+        self.assertEqual([program.uuid for program in categories[0].programs], ['a1', 'b2', 'c3'])
+        self.assertEqual([episode.uuid for episode in categories[1].episodes], ['a1b2c3d4-0001', 'a1b2c3d4-0002', 'a1b2c3d4-0003', 'a1b2c3d4-0004'])
+
+        # The categories come from the cache now
+        category = self._api.get_recommendation_category(categories[1].uuid)
+        self.assertEqual(category.title, 'Nieuwste afleveringen')
+        self.assertIsNone(self._api.get_recommendation_category('onbekend'))
+
+    def test_not_modified(self):
+        session = self._set_responses({'/programmas': [
+            FakeResponse(200, PROGRAMS_PAGE, {'ETag': '"v1"'}),
+            FakeResponse(304),
+        ]})
+
+        self.assertEqual(len(self._api.get_programs()), 3)
+        self.assertEqual(session.requests[0][1], {})
+
+        # A refresh sends the ETag we got, and keeps the cached listing when it is not modified
+        self.assertEqual(len(self._api.get_programs(cache=CACHE_PREVENT)), 3)
+        self.assertEqual(session.requests[1][1], {'If-None-Match': '"v1"'})
+        self.assertEqual(self._cache.get_validators(['programs']), ('"v1"', None))
+
+    def test_not_modified_program(self):
+        session = self._set_responses({'/de-mol': [
+            FakeResponse(200, PROGRAM_PAGE, {'Last-Modified': 'Wed, 01 Jan 2020 00:00:00 GMT'}),
+            FakeResponse(304),
+            FakeResponse(200, PROGRAM_PAGE),
+        ]})
+
+        self.assertEqual(self._api.get_program('de-mol').title, 'De Mol')
+
+        # A refresh sends the Last-Modified we got, and keeps the cached program when it is not modified
+        self.assertEqual(self._api.get_program('de-mol', cache=CACHE_PREVENT).title, 'De Mol')
+        self.assertEqual(session.requests[1][1], {'If-Modified-Since': 'Wed, 01 Jan 2020 00:00:00 GMT'})
+
+        # We need the html to extract the clips, so we always fetch it then
+        self._api.get_program('de-mol', extract_clips=True, cache=CACHE_PREVENT)
+        self.assertEqual(session.requests[2][1], {})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,11 +5,19 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import base64
+import json
 import logging
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
 from resources.lib import kodiutils
-from resources.lib.viervijfzes.auth import AuthApi
+from resources.lib.viervijfzes import auth as auth_module
+from resources.lib.viervijfzes.auth import AuthApi, LoginInProgressException
+from resources.lib.viervijfzes.aws.cognito_idp import CognitoIdp
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,6 +41,175 @@ class TestAuth(unittest.TestCase):
         id_token = auth.get_token()
         self.assertTrue(id_token)
 
+    def test_lazy_srp(self):
+        idp_client = CognitoIdp(AuthApi.COGNITO_POOL_ID, AuthApi.COGNITO_CLIENT_ID)
+        self.assertIsNone(idp_client._large_a_value)  # pylint: disable=protected-access
+
+        large_a_value = idp_client.large_a_value
+        self.assertEqual(large_a_value, pow(idp_client.g, idp_client.small_a_value, idp_client.big_n))
+        self.assertEqual(idp_client.large_a_value, large_a_value)
+
+    def test_token_expiry(self):
+        self.assertEqual(AuthApi.get_token_expiry(create_token(1600000000)), 1600000000)
+        self.assertIsNone(AuthApi.get_token_expiry('invalid'))
+        self.assertIsNone(AuthApi.get_token_expiry(None))
+
+    def test_refresh_if_needed(self):
+        path = tempfile.mkdtemp()
+        try:
+            auth = AuthApi('username', 'password', path, refresh_margin=300)
+            auth._refresh = lambda refresh_token: create_token(int(time.time()) + 3600)  # pylint: disable=protected-access
+            auth._authenticate = lambda username, password: (create_token(int(time.time()) + 3600), 'refresh-token')  # pylint: disable=protected-access
+
+            # We have no token yet, so we log in
+            self.assertTrue(auth.refresh_if_needed())
+            self.assertFalse(auth.needs_refresh())
+            self.assertFalse(auth.refresh_if_needed())
+
+            # The token expires within the margin, so it's refreshed
+            auth._id_token = create_token(int(time.time()) + 200)  # pylint: disable=protected-access
+            auth._expiry = int(time.time()) + 200  # pylint: disable=protected-access
+            self.assertTrue(auth.needs_refresh())
+            old_token = auth._id_token  # pylint: disable=protected-access
+            self.assertNotEqual(auth.get_token(), old_token)
+            self.assertFalse(auth.needs_refresh())
+        finally:
+            shutil.rmtree(path)
+
+    def test_save_tokens(self):
+        path = tempfile.mkdtemp()
+        try:
+            auth = AuthApi('username', 'password', path, refresh_margin=300)
+            auth._authenticate = lambda username, password: (create_token(int(time.time()) + 3600), 'refresh-token')  # pylint: disable=protected-access
+            other = AuthApi('username', 'password', path, refresh_margin=300)
+            other._authenticate = lambda username, password: self.fail('We should not log in twice')  # pylint: disable=protected-access
+
+            # The first process logs in and stores the tokens
+            id_token = auth.get_token()
+            token_file = os.path.join(path, AuthApi.TOKEN_FILE)
+            self.assertTrue(os.path.exists(token_file))
+            self.assertFalse(os.path.exists(os.path.join(path, AuthApi.LOCK_FILE)))
+
+            # The second process uses the tokens of the first process
+            self.assertEqual(other.get_token(), id_token)
+
+            # Unchanged tokens are not written again
+            os.unlink(token_file)
+            self.assertEqual(auth.get_token(), id_token)
+            auth._save_tokens()  # pylint: disable=protected-access
+            self.assertFalse(os.path.exists(token_file))
+        finally:
+            shutil.rmtree(path)
+
+    def test_stale_lock(self):
+        path = tempfile.mkdtemp()
+        try:
+            auth = AuthApi('username', 'password', path, refresh_margin=300)
+            auth._authenticate = lambda username, password: (create_token(int(time.time()) + 3600), 'refresh-token')  # pylint: disable=protected-access
+
+            # Another process has abandoned its lock
+            lock_file = os.path.join(path, AuthApi.LOCK_FILE)
+            with open(lock_file, 'w'):
+                pass
+            os.utime(lock_file, (time.time() - AuthApi.LOCK_STALE - 1, time.time() - AuthApi.LOCK_STALE - 1))
+
+            self.assertTrue(auth.get_token())
+            self.assertFalse(os.path.exists(lock_file))
+        finally:
+            shutil.rmtree(path)
+
+    def test_lock_timeout(self):
+        # We break an abandoned lock before we give up waiting for it
+        self.assertLessEqual(AuthApi.LOCK_STALE, AuthApi.LOCK_TIMEOUT)
+
+        path = tempfile.mkdtemp()
+        try:
+            auth = QuickLockAuthApi('username', 'password', path, refresh_margin=300)
+            auth._authenticate = lambda username, password: (create_token(int(time.time()) + 3600), 'refresh-token')  # pylint: disable=protected-access
+
+            # Another process is still logging in
+            with open(os.path.join(path, AuthApi.LOCK_FILE), 'w'):
+                pass
+            with self.assertRaises(LoginInProgressException):
+                auth.get_token()
+
+            # When we only wanted to refresh ahead of time, we keep using our current id token
+            id_token = create_token(int(time.time()) + 60)
+            auth._id_token = id_token  # pylint: disable=protected-access
+            auth._expiry = int(time.time()) + 60  # pylint: disable=protected-access
+            self.assertEqual(auth.get_token(), id_token)
+        finally:
+            shutil.rmtree(path)
+
+    def test_cached_identity(self):
+        path = tempfile.mkdtemp()
+        original = auth_module.CognitoIdentity
+        auth_module.CognitoIdentity = FakeCognitoIdentity
+        FakeCognitoIdentity.calls = []
+        try:
+            auth = AuthApi('username', 'password', path, refresh_margin=300)
+            auth._authenticate = lambda username, password: (create_token(int(time.time()) + 3600), 'refresh-token')  # pylint: disable=protected-access
+
+            # The first time, we request the identity id and credentials
+            identity_id, credentials = auth.get_identity()
+            self.assertEqual(identity_id, 'identity-id')
+            self.assertEqual(FakeCognitoIdentity.calls, ['get_id', 'get_credentials_for_identity'])
+
+            # Another process uses the stored identity id and credentials
+            other = AuthApi('username', 'password', path, refresh_margin=300)
+            self.assertEqual(other.get_identity(), (identity_id, credentials))
+            self.assertEqual(len(FakeCognitoIdentity.calls), 2)
+
+            # Rejected credentials are renewed, but the identity id is kept
+            self.assertNotEqual(other.get_identity(rejected=credentials)[1], credentials)
+            self.assertEqual(FakeCognitoIdentity.calls[2:], ['get_credentials_for_identity'])
+
+            # Expired credentials are renewed
+            other._credentials = dict(other._credentials, Expiration=time.time())  # pylint: disable=protected-access
+            other._save_tokens()  # pylint: disable=protected-access
+            self.assertFalse(other.has_valid_credentials())
+            other.get_identity()
+            self.assertEqual(len(FakeCognitoIdentity.calls), 4)
+        finally:
+            auth_module.CognitoIdentity = original
+            shutil.rmtree(path)
+
+
+class QuickLockAuthApi(AuthApi):
+    """ Gives up waiting for the lock of another login quickly """
+    LOCK_TIMEOUT = 0.2
+
+
+class FakeCognitoIdentity:
+    """ Returns fake identities and credentials, and remembers which calls were made """
+    calls = []
+
+    def __init__(self, pool_id, identity_pool_id):
+        pass
+
+    @staticmethod
+    def get_id(id_token):
+        assert id_token
+        FakeCognitoIdentity.calls.append('get_id')
+        return 'identity-id'
+
+    @staticmethod
+    def get_credentials_for_identity(id_token, identity_id):
+        assert id_token and identity_id
+        FakeCognitoIdentity.calls.append('get_credentials_for_identity')
+        return {
+            'AccessKeyId': 'access-key-%d' % len(FakeCognitoIdentity.calls),
+            'SecretKey': 'secret-key',
+            'SessionToken': 'session-token',
+            'Expiration': time.time() + 3600,
+        }
+
+
+def create_token(expiry):
+    """ Create an unsigned JWT token with the specified expiry """
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': expiry}).encode('utf-8')).decode('ascii').rstrip('=')
+    return 'header.%s.signature' % payload
+
 
 if __name__ == '__main__':
     unittest.main()
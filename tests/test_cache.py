@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+""" Tests for the cache storage """
+
+# pylint: disable=missing-docstring,no-self-use,protected-access
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from resources.lib.viervijfzes.cache import SqliteCacheStore
+from resources.lib.viervijfzes.content import CACHE_STALE_OK, ContentApi
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def test_set_get(self):
+        cache = SqliteCacheStore(self._path)
+        cache.set(['program', 'de-mol'], {'title': 'De Mol'}, ttl=60)
+        self.assertEqual(cache.get(['program', 'de-mol']), {'title': 'De Mol'})
+        self.assertIsNone(cache.get(['program', 'gentwest']))
+
+        cache.delete(['program', 'de-mol'])
+        self.assertIsNone(cache.get(['program', 'de-mol']))
+        cache.close()
+
+    def test_expired(self):
+        cache = SqliteCacheStore(self._path)
+        cache.set(['programs'], [1, 2, 3], ttl=-10)
+        self.assertIsNone(cache.get(['programs']))
+        self.assertEqual(cache.get(['programs'], allow_expired=True), [1, 2, 3])
+
+        cache.purge(max_age=60)
+        self.assertEqual(cache.get(['programs'], allow_expired=True), [1, 2, 3])
+        cache.purge()
+        self.assertIsNone(cache.get(['programs'], allow_expired=True))
+        cache.close()
+
+    def test_migrate_json_files(self):
+        fullpath = os.path.join(self._path, 'episode.video_de-mol_s1.json')
+        with open(fullpath, 'w') as fdesc:
+            json.dump({'title': 'De Mol'}, fdesc)
+        deadline = int(time.time()) + 60
+        os.utime(fullpath, (deadline, deadline))
+
+        cache = SqliteCacheStore(self._path)
+        self.assertEqual(cache.get(['episode', 'video/de-mol/s1']), {'title': 'De Mol'})
+        self.assertFalse(os.path.exists(fullpath))
+        cache.close()
+
+    def test_upgrade(self):
+        # The schema of every older version, and the statements to add a row to it
+        schemas = {
+            1: ['CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expiry INTEGER NOT NULL, etag TEXT)'],
+            2: ['CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expiry INTEGER NOT NULL, etag TEXT)',
+                'CREATE TABLE refresh_queue (key TEXT PRIMARY KEY, queued INTEGER NOT NULL)'],
+            3: ['CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expiry INTEGER NOT NULL, etag TEXT, last_modified TEXT)',
+                'CREATE TABLE refresh_queue (key TEXT PRIMARY KEY, queued INTEGER NOT NULL)'],
+        }
+        for version in (0, 1, 2, 3):
+            path = tempfile.mkdtemp()
+            try:
+                conn = sqlite3.connect(os.path.join(path, SqliteCacheStore.DB_FILE))
+                for statement in schemas.get(version, []):
+                    conn.execute(statement)
+                if version:
+                    conn.execute('INSERT INTO cache (key, value, expiry, etag) VALUES (?, ?, ?, ?)',
+                                 ('programs', '[1, 2, 3]', int(time.time()) + 60, '"abc"'))
+                else:
+                    with open(os.path.join(path, 'programs.json'), 'w') as fdesc:
+                        json.dump([1, 2, 3], fdesc)
+                    os.utime(os.path.join(path, 'programs.json'), (time.time() + 60, time.time() + 60))
+                conn.execute('PRAGMA user_version = %d' % version)
+                conn.commit()
+                conn.close()
+
+                # The cached items are kept, and the features of the newer versions work
+                cache = SqliteCacheStore(path)
+                self.assertEqual(cache.get(['programs']), [1, 2, 3], 'Upgrading from version %d' % version)
+                cache.set(['content_tree'], {'a': 1}, ttl=60, etag='"def"', last_modified='Wed, 01 Jan 2020 00:00:00 GMT')
+                self.assertEqual(cache.get_validators(['content_tree']), ('"def"', 'Wed, 01 Jan 2020 00:00:00 GMT'))
+                cache.queue_refresh(['programs'])
+                self.assertEqual(cache.pop_refresh_queue(), [['programs']])
+                self.assertEqual(cache.add_budget_call('catalog', True), {'calls': 1, 'exceeded': 1})
+                self.assertEqual(cache._connect().execute('PRAGMA user_version').fetchone()[0], SqliteCacheStore.SCHEMA_VERSION)
+                cache.close()
+            finally:
+                shutil.rmtree(path)
+
+    def test_refresh_queue(self):
+        cache = SqliteCacheStore(self._path)
+        cache.queue_refresh(['programs'])
+        cache.queue_refresh(['program', 'de-mol'])
+        cache.queue_refresh(['programs'])
+        self.assertEqual(cache.pop_refresh_queue(), [['programs'], ['program', 'de-mol']])
+        self.assertEqual(cache.pop_refresh_queue(), [])
+        cache.close()
+
+    def test_stale_ok(self):
+        cache = SqliteCacheStore(self._path)
+        api = ContentApi(cache=cache)
+
+        def update():
+            raise AssertionError('We should not block on an update')
+
+        # Expired data is served, and a refresh is queued
+        cache.set(['programs'], [1, 2, 3], ttl=-10)
+        self.assertEqual(api._handle_cache(key=['programs'], cache_mode=CACHE_STALE_OK, update=update), [1, 2, 3])
+        self.assertEqual(cache.pop_refresh_queue(), [['programs']])
+
+        # Without any data, we need to update
+        self.assertEqual(api._handle_cache(key=['content_tree'], cache_mode=CACHE_STALE_OK, update=lambda: {'a': 1}), {'a': 1})
+        self.assertEqual(cache.pop_refresh_queue(), [])
+        cache.close()
+
+    def test_validators(self):
+        cache = SqliteCacheStore(self._path)
+        cache.set(['programs'], [1, 2, 3], ttl=-10, etag='"abc"', last_modified='Wed, 01 Jan 2020 00:00:00 GMT')
+        self.assertEqual(cache.get_validators(['programs']), ('"abc"', 'Wed, 01 Jan 2020 00:00:00 GMT'))
+        self.assertEqual(cache.get_validators(['content_tree']), (None, None))
+
+        cache.touch(['programs'], ttl=60)
+        self.assertEqual(cache.get(['programs']), [1, 2, 3])
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+""" Tests for the shared API objects """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import unittest
+
+from resources.lib import context, kodiutils
+
+
+class TestContext(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TestContext, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        context.reset()
+
+    def tearDown(self):
+        context.reset()
+
+    def test_shared_instances(self):
+        api = context.get_content_api()
+        self.assertIs(context.get_content_api(), api)
+        self.assertIs(context.get_auth(), context.get_auth())
+        self.assertIs(context.get_epg_api(), context.get_epg_api())
+        self.assertIs(context.get_search_api()._api, api)  # pylint: disable=protected-access
+
+        # Everything is created again after a reset
+        context.reset()
+        self.assertIsNot(context.get_content_api(), api)
+
+    def test_changed_credentials(self):
+        username = kodiutils.get_setting('username')
+        auth = context.get_auth()
+        api = context.get_content_api()
+        epg = context.get_epg_api()
+        try:
+            kodiutils.set_setting('username', username + '-changed')
+            self.assertIsNot(context.get_auth(), auth)
+            # The ContentApi looks up the new auth on its next authenticated call
+            self.assertIs(context.get_content_api(), api)
+            self.assertIs(api._auth(), context.get_auth())  # pylint: disable=protected-access
+            self.assertIs(context.get_epg_api(), epg)
+        finally:
+            kodiutils.set_setting('username', username)
+
+
+if __name__ == '__main__':
+    unittest.main()
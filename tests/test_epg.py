@@ -6,16 +6,38 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import logging
+import shutil
+import tempfile
+import time
 import unittest
-from datetime import date
+from datetime import date, timedelta
 
 from resources.lib import kodiutils
+from resources.lib.viervijfzes import budget
+from resources.lib.viervijfzes.cache import SqliteCacheStore
 from resources.lib.viervijfzes.content import ContentApi, Episode
 from resources.lib.viervijfzes.epg import EpgApi, EpgProgram
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):  # pylint: disable=unused-argument
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
 class TestEpg(unittest.TestCase):
     def __init__(self, *args, **kwargs):
         super(TestEpg, self).__init__(*args, **kwargs)
@@ -53,6 +75,121 @@ class TestEpg(unittest.TestCase):
         episode = api.get_episode(epg_program.video_url)
         self.assertIsInstance(episode, Episode)
 
+    def test_epg_multiple(self):
+        def get_epg(channel, date, refresh=False):  # pylint: disable=redefined-outer-name,unused-argument
+            if date == '2020-01-02':
+                raise Exception('Could not fetch data')
+            return [channel + date]
+
+        epg = EpgApi()
+        epg.get_epg = get_epg
+        results = epg.get_epg_multiple([('Play4', '2020-01-01'), ('Play4', '2020-01-02'), ('Play5', '2020-01-01')])
+        self.assertEqual(results, {
+            ('Play4', '2020-01-01'): ['Play42020-01-01'],
+            ('Play4', '2020-01-02'): [],
+            ('Play5', '2020-01-01'): ['Play52020-01-01'],
+        })
+
+    def test_iter_epg_multiple_window(self):
+        fetched = []
+
+        def get_epg(channel, date, refresh=False):  # pylint: disable=redefined-outer-name,unused-argument
+            fetched.append(date)
+            return [channel + date]
+
+        epg = EpgApi()
+        epg.get_epg = get_epg
+        requests_list = [('Play4', '2020-01-%02d' % day) for day in range(1, 21)]
+
+        # Only a window of requests is fetched ahead of the caller
+        results = epg.iter_epg_multiple(requests_list, max_workers=2)
+        for index, (request, programs) in enumerate(results):
+            self.assertEqual(request, requests_list[index])
+            self.assertEqual(programs, ['Play4' + request[1]])
+            self.assertLessEqual(len(fetched), index + 1 + 2)
+        self.assertEqual(len(fetched), 20)
+
+        # The remaining requests are not fetched when the caller stops early
+        del fetched[:]
+        results = epg.iter_epg_multiple(requests_list, max_workers=2)
+        next(results)
+        results.close()
+        self.assertLessEqual(len(fetched), 3)
+
+    def test_iter_epg_multiple_budget(self):
+        def get_epg(channel, date, refresh=False):  # pylint: disable=redefined-outer-name,unused-argument
+            return [budget.get_remaining_budget()]
+
+        epg = EpgApi()
+        epg.get_epg = get_epg
+        requests_list = [('Play4', '2020-01-01'), ('Play5', '2020-01-01')]
+
+        # The workers get the latency budget of the caller
+        with budget.use_deadline(time.time() + 10):
+            for _, programs in epg.iter_epg_multiple(requests_list):
+                self.assertIsNotNone(programs[0])
+                self.assertLessEqual(programs[0], 10)
+
+        for _, programs in epg.iter_epg_multiple(requests_list):
+            self.assertIsNone(programs[0])
+
+    def test_epg_cache(self):
+        path = tempfile.mkdtemp()
+        cache = SqliteCacheStore(path)
+        try:
+            epg = EpgApi(cache=cache)
+            responses = []
+
+            def get_url(url, cache_key=None):  # pylint: disable=unused-argument
+                responses.append(url)
+                return '[{"program_title": "De Mol", "timestamp": 1577836800, "duration": 3600}]', None, None
+
+            epg._get_url = get_url  # pylint: disable=protected-access
+            self.assertEqual(len(epg.get_epg('Play4', '2020-01-01')), 1)
+            self.assertEqual(len(epg.get_epg('Play4', '2020-01-01')), 1)
+            self.assertEqual(len(responses), 1)
+
+            epg.invalidate('Play4')
+            self.assertEqual(len(epg.get_epg('Play4', '2020-01-01')), 1)
+            self.assertEqual(len(responses), 2)
+
+            programs = epg.get_epg_range('Play5', date(2020, 1, 1), date(2020, 1, 3))
+            self.assertEqual(sorted(programs.keys()), ['2020-01-01', '2020-01-02', '2020-01-03'])
+            self.assertEqual(len(responses), 5)
+        finally:
+            cache.close()
+            shutil.rmtree(path)
+
+    def test_epg_conditional(self):
+        path = tempfile.mkdtemp()
+        cache = SqliteCacheStore(path)
+        try:
+            epg = EpgApi(cache=cache)
+            session = FakeSession([
+                FakeResponse(200, '[{"program_title": "De Mol", "timestamp": 1577836800, "duration": 3600}]', {'ETag': '"v1"'}),
+                FakeResponse(304),
+            ])
+            epg._session = session  # pylint: disable=protected-access
+
+            self.assertEqual(len(epg.get_epg('Play4', '2020-01-01')), 1)
+            self.assertEqual(session.requests[0], {})
+
+            # A refresh sends the ETag we got, and keeps the cached data when it is not modified
+            self.assertEqual(len(epg.get_epg('Play4', '2020-01-01', refresh=True)), 1)
+            self.assertEqual(session.requests[1], {'If-None-Match': '"v1"'})
+        finally:
+            cache.close()
+            shutil.rmtree(path)
+
+    def test_epg_ttl(self):
+        epg = EpgApi()
+        today = date.today()
+        # pylint: disable=protected-access
+        self.assertEqual(epg._get_ttl(today.strftime('%Y-%m-%d')), EpgApi.TTL_TODAY)
+        self.assertEqual(epg._get_ttl((today + timedelta(days=1)).strftime('%Y-%m-%d')), EpgApi.TTL_FUTURE)
+        self.assertEqual(epg._get_ttl((today - timedelta(days=1)).strftime('%Y-%m-%d')), EpgApi.TTL_YESTERDAY)
+        self.assertEqual(epg._get_ttl((today - timedelta(days=3)).strftime('%Y-%m-%d')), EpgApi.TTL_PAST)
+
     # def test_map_epg_genre(self):
     #     genres = []
     #     for channel in ['vier', 'vijf', 'zes']:
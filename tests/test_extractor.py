@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+""" Tests for the HTML extractor """
+
+# pylint: disable=missing-docstring,no-self-use,protected-access
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import unittest
+
+from resources.lib.viervijfzes import extractor
+from resources.lib.viervijfzes.content import ContentApi
+
+
+def load_fixture(filename):
+    with open(os.path.join(os.path.dirname(__file__), 'data', filename), 'rb') as fdesc:
+        return fdesc.read().decode('utf-8')
+
+
+class TestExtractor(unittest.TestCase):
+    def setUp(self):
+        self._html = load_fixture('goplay_home.html')
+
+    def test_extract_teasers(self):
+        teasers = list(extractor.extract_teasers(self._html))
+        self.assertEqual([teaser.path for teaser in teasers], [
+            '/', '/programmas', '/de-mol', '/gentwest', '/jani-gaat', '/nieuws/artikel-1',
+            '/video/de-mol/de-mol-s11/de-mol-s11-aflevering-1',
+            '/video/gentwest/gentwest-s2/gentwest-s2-aflevering-7',
+            '/video/jani-gaat/jani-gaat-s6/jani-gaat-s6-aflevering-3',
+            '/video/extra/trailer',
+            '/zonder-titel',
+            '/privacy',
+        ])
+
+        teaser = teasers[6]
+        self.assertEqual(teaser.kind, 'episode')
+        self.assertEqual(teaser.title, 'Aflevering 1')
+        self.assertEqual(teaser.program, 'De Mol')
+        self.assertEqual(teaser.duration, 2712)
+        self.assertEqual(teaser.video_id, 'a1b2c3d4-0001')
+        self.assertEqual(teaser.image, 'https://images.goplay.be/de-mol-s11-1.jpg')
+        self.assertEqual(teaser.badge, 'Nieuw')
+
+        # Entities are decoded
+        self.assertEqual(teasers[2].image, 'https://images.goplay.be/de-mol.jpg?w=300&h=450')
+        self.assertEqual(teasers[4].title, 'Jani gaat & co')
+        self.assertEqual(teasers[7].title, 'Aflevering 7 "De haven"')
+
+        # The kind of teaser
+        self.assertEqual(teasers[2].kind, 'poster')
+        self.assertEqual(teasers[5].kind, 'card')
+
+        # Missing fields
+        self.assertIsNone(teasers[8].duration)
+        self.assertIsNone(teasers[8].program)
+        self.assertIsNone(teasers[0].title)
+        self.assertIsNone(teasers[0].kind)
+
+    def test_extract_categories(self):
+        categories = list(extractor.extract_categories(self._html))
+        self.assertEqual([title for title, _ in categories], ['Populair [B]Nu op GoPlay[/B]', 'Nieuwste afleveringen'])
+
+    def test_extract_json(self):
+        self.assertEqual(extractor.extract_drupal_settings(self._html), {'path': {'currentPath': 'node/1'}})
+        self.assertIsNone(extractor.extract_hero_data(self._html))
+        self.assertIsNone(extractor.extract_video_data(self._html))
+        self.assertEqual(extractor.extract_programs_data('<div data-program="{&quot;id&quot;:1}"></div><div data-program="{}"></div>'), [{'id': 1}, {}])
+
+    def test_content_api(self):
+        categories = list(extractor.extract_categories(self._html))
+
+        # Only poster teasers are programs, so the news article is skipped
+        programs = ContentApi._extract_programs(list(extractor.extract_teasers(categories[0][1])))
+        self.assertEqual([(program.path, program.title) for program in programs], [
+            ('de-mol', 'De Mol'), ('gentwest', 'Gent-West'), ('jani-gaat', 'Jani gaat & co'),
+        ])
+
+        episodes = ContentApi._extract_videos(list(extractor.extract_teasers(categories[1][1])))
+        self.assertEqual([episode.path for episode in episodes], [
+            'video/de-mol/de-mol-s11/de-mol-s11-aflevering-1',
+            'video/gentwest/gentwest-s2/gentwest-s2-aflevering-7',
+            'video/jani-gaat/jani-gaat-s6/jani-gaat-s6-aflevering-3',
+            'video/extra/trailer',
+        ])
+        self.assertEqual(episodes[0].description, 'Aflevering 1\n\n[B]Nieuw[/B]')
+        self.assertEqual(episodes[0].program_title, 'De Mol')
+        self.assertEqual(episodes[3].thumb, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+""" Tests for IPTV Manager """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import unittest
+
+from resources.lib.modules.iptvmanager import stream_json_epg
+
+
+class TestIptvManager(unittest.TestCase):
+    def test_stream_json_epg(self):
+        days = [
+            ('play4.be', [{'title': 'De Mol', 'episode': 'S1E1'}, {'title': 'Gent-West', 'episode': None}]),
+            ('play4.be', []),
+            ('play4.be', [{'title': 'Het Journaal', 'description': 'Nieuws één'}]),
+            ('play5.be', []),
+            ('play6.be', [{'title': 'NCIS'}]),
+        ]
+
+        expected = {'version': 1, 'epg': {}}
+        for iptv_id, programmes in days:
+            expected['epg'].setdefault(iptv_id, []).extend(programmes)
+
+        # Compare the parsed documents, since the order of the keys isn't fixed
+        self.assertEqual(json.loads(''.join(stream_json_epg(days))), expected)
+
+    def test_stream_json_epg_error(self):
+        def generate_days():
+            yield 'play4.be', [{'title': 'De Mol'}]
+            yield 'play4.be', [{'title': 'Gent-West', 'image': object()}]
+            yield 'play5.be', [{'title': 'NCIS'}]
+            raise IOError('Could not fetch data')
+
+        # We skip the day that can't be sent, and stop when the days fail, but the document is always valid JSON
+        self.assertEqual(json.loads(''.join(stream_json_epg(generate_days()))),
+                         {'version': 1, 'epg': {'play4.be': [{'title': 'De Mol'}], 'play5.be': [{'title': 'NCIS'}]}})
+
+    def test_stream_json_epg_empty(self):
+        self.assertEqual(json.loads(''.join(stream_json_epg([]))), {'version': 1, 'epg': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+""" Tests for the Kodi helpers """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import unittest
+
+from resources.lib import kodiutils
+
+
+class TestKodiUtils(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TestKodiUtils, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        kodiutils.reset_global_settings()
+        kodiutils.reset_memo()
+
+    def tearDown(self):
+        kodiutils.reset_global_settings()
+        kodiutils.reset_memo()
+
+    def test_global_settings_batch(self):
+        calls = []
+
+        def jsonrpc(*args, **kwargs):
+            calls.append(args or [kwargs])
+            return [{'id': cmd['id'], 'jsonrpc': '2.0', 'result': {'value': cmd['params']['setting']}} for cmd in reversed(args)]
+
+        original = kodiutils.jsonrpc
+        kodiutils.jsonrpc = jsonrpc
+        try:
+            # All the settings we use are fetched with one call
+            self.assertEqual(kodiutils.get_global_setting('videolibrary.showallitems'), 'videolibrary.showallitems')
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(calls[0]), len(kodiutils.GLOBAL_SETTINGS))
+
+            settings = kodiutils.get_global_settings(['locale.language', 'network.usehttpproxy'])
+            self.assertEqual(settings, {'locale.language': 'locale.language', 'network.usehttpproxy': 'network.usehttpproxy'})
+            self.assertEqual(len(calls), 1)
+
+            # A setting we don't know yet is fetched on its own
+            kodiutils.get_global_setting('videoplayer.useomxplayer')
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(len(calls[1]), 1)
+        finally:
+            kodiutils.jsonrpc = original
+
+    def test_global_settings_without_batch(self):
+        # The Kodi stubs don't support batches, so we fall back to one call per setting
+        self.assertEqual(kodiutils.get_global_setting('locale.language'), kodiutils.jsonrpc(
+            method='Settings.GetSettingValue', params={'setting': 'locale.language'}).get('result', {}).get('value'))
+
+    def test_memo(self):
+        addon = CountingAddon(kodiutils.ADDON)
+        original = kodiutils.ADDON
+        kodiutils.ADDON = addon
+        try:
+            # A listing asks for the same translations and settings for every item
+            for _ in range(100):
+                kodiutils.localize(30100)
+                kodiutils.localize(30102, program='test')
+                kodiutils.get_setting('username')
+                kodiutils.get_setting_int('listing_budget', 10)
+            self.assertEqual(addon.calls, {'getLocalizedString': 2, 'getSetting': 1, 'getSettingInt': 1})
+
+            # A setting we change is read again
+            username = kodiutils.get_setting('username')
+            kodiutils.set_setting('username', username + '-changed')
+            try:
+                self.assertEqual(kodiutils.get_setting('username'), username + '-changed')
+            finally:
+                kodiutils.set_setting('username', username)
+            self.assertEqual(kodiutils.get_setting('username'), username)
+
+            # Everything is read again after a reset
+            kodiutils.reset_memo()
+            kodiutils.localize(30100)
+            self.assertEqual(addon.calls['getLocalizedString'], 3)
+        finally:
+            kodiutils.ADDON = original
+
+
+class CountingAddon:
+    """ Counts the calls to the Kodi API of an Addon """
+
+    def __init__(self, addon):
+        self._addon = addon
+        self.calls = {}
+
+    def __getattr__(self, name):
+        method = getattr(self._addon, name)
+
+        def wrapper(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,7 +15,8 @@ import unittest
 import pytest
 
 from resources.lib import addon, kodiutils
-from resources.lib.service import BackgroundService
+from resources.lib.service import BackgroundService, ScheduledTask
+from resources.lib.viervijfzes.aws.cognito_idp import AuthenticationException, InvalidLoginException
 
 routing = addon.routing
 
@@ -41,5 +42,143 @@ class TestService(unittest.TestCase):
         service.run()
 
 
+class TestServiceTasks(unittest.TestCase):
+    """ Tests for the tasks of the background service, these don't need credentials """
+
+    def test_scheduled_task(self):
+        now = time.time()
+        task = ScheduledTask('test', None, 100, delay=50)
+        self.assertTrue(now + 45 <= task.next_run <= time.time() + 55)
+
+        # The runs are spread with 10%
+        runs = set()
+        for _ in range(10):
+            now = time.time()
+            task.schedule()
+            self.assertTrue(now + 90 <= task.next_run <= time.time() + 110)
+            runs.add(task.next_run - now)
+        self.assertGreater(len(runs), 1)
+
+    def test_prewarm_disabled(self):
+        kodiutils.set_setting_bool('prewarm_enabled', False)
+        try:
+            service = BackgroundService()
+            ran = run_once(service)
+            self.assertEqual(ran, ['purge', 'token', 'proxies'])
+
+            # The skipped tasks are planned again
+            for task in service._tasks:  # pylint: disable=protected-access
+                self.assertGreater(task.next_run, time.time())
+
+            kodiutils.set_setting_bool('prewarm_enabled', True)
+            ran = run_once(service)
+            self.assertEqual(ran, ['programs', 'program_tree', 'epg', 'mylist', 'purge', 'token', 'proxies'])
+        finally:
+            kodiutils.set_setting_bool('prewarm_enabled', True)
+
+    def test_failed_refresh_queued(self):
+        # The tasks still run when refreshing the queued cache items fails
+        ran = run_once(BackgroundService(), api=FailingApi())
+        self.assertEqual(ran, ['programs', 'program_tree', 'epg', 'mylist', 'purge', 'token', 'proxies'])
+
+    def test_prewarm_interval_changed(self):
+        interval = kodiutils.get_setting_int('prewarm_interval')
+        try:
+            service = BackgroundService()
+            kodiutils.set_setting_int('prewarm_interval', 60)
+            now = time.time()
+            service.onSettingsChanged()
+
+            tasks = {task.name: task for task in service._tasks}  # pylint: disable=protected-access
+            for name in ('programs', 'program_tree', 'epg'):
+                self.assertEqual(tasks[name].interval, 60 * 60)
+                self.assertTrue(now + 54 * 60 <= tasks[name].next_run <= time.time() + 66 * 60)
+
+            # My List keeps being refreshed once a day
+            self.assertEqual(tasks['mylist'].interval, 24 * 3600)
+        finally:
+            kodiutils.set_setting_int('prewarm_interval', interval)
+
+    def test_refused_login(self):
+        service = BackgroundService()
+        auth = RefusingAuth()
+        service._auth = auth  # pylint: disable=protected-access
+
+        # We stop trying after the credentials were refused
+        service._refresh_token()  # pylint: disable=protected-access
+        service._refresh_token()  # pylint: disable=protected-access
+        self.assertEqual(auth.calls, 1)
+
+        # We try again when the credentials have changed
+        kodiutils.set_setting('credentials_hash', 'changed')
+        service.onSettingsChanged()
+        self.assertTrue(auth.cleared)
+        service._auth = auth  # pylint: disable=protected-access
+        service._refresh_token()  # pylint: disable=protected-access
+        self.assertEqual(auth.calls, 2)
+
+    def test_failed_refresh(self):
+        service = BackgroundService()
+        auth = RefusingAuth(AuthenticationException('Rate exceeded'))
+        service._auth = auth  # pylint: disable=protected-access
+
+        # We wait a while before we try again
+        now = time.time()
+        service._refresh_token()  # pylint: disable=protected-access
+        service._refresh_token()  # pylint: disable=protected-access
+        self.assertEqual(auth.calls, 1)
+        self.assertGreaterEqual(service._refresh_retry - now, 120)  # pylint: disable=protected-access
+
+        # We don't give up, but we wait longer after every failure
+        service._refresh_retry = 0  # pylint: disable=protected-access
+        now = time.time()
+        service._refresh_token()  # pylint: disable=protected-access
+        self.assertEqual(auth.calls, 2)
+        self.assertFalse(service._login_refused)  # pylint: disable=protected-access
+        self.assertGreaterEqual(service._refresh_retry - now, 240)  # pylint: disable=protected-access
+
+
+def run_once(service, api=None):
+    """ Run one pass of the background loop with all tasks due, and return the names of the tasks that ran """
+    ran = []
+    for task in service._tasks:  # pylint: disable=protected-access
+        task.func = lambda name=task.name: ran.append(name)
+        task.next_run = 0
+    service._api = api or IdleApi()  # pylint: disable=protected-access
+    service.waitForAbort = lambda timeout: True
+    service.run()
+    return ran
+
+
+class IdleApi:
+    """ A ContentApi that has nothing to refresh """
+
+    def refresh_queued(self):
+        pass
+
+
+class FailingApi:
+    """ A ContentApi that can't refresh the queued cache items """
+
+    def refresh_queued(self):
+        raise IOError('Could not fetch data')
+
+
+class RefusingAuth:
+    """ An AuthApi that refuses the credentials, or fails with another exception """
+
+    def __init__(self, exception=None):
+        self.calls = 0
+        self.cleared = False
+        self.exception = exception or InvalidLoginException('Incorrect username or password.')
+
+    def refresh_if_needed(self):
+        self.calls += 1
+        raise self.exception
+
+    def clear_tokens(self):
+        self.cleared = True
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+""" Tests for AWS Signature Version 4 """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import binascii
+import datetime
+import unittest
+
+import requests
+
+from resources.lib.viervijfzes.aws import sigv4
+from resources.lib.viervijfzes.aws.sigv4 import SigV4Signer, get_canonical_querystring, get_signing_key
+
+# Test vectors from the AWS Signature Version 4 test suite
+ACCESS_KEY = 'AKIDEXAMPLE'
+SECRET_KEY = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+AMZDATE = '20150830T123600Z'
+HOST = 'example.amazonaws.com'
+
+
+class TestSigV4(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TestSigV4, self).__init__(*args, **kwargs)
+
+    def test_signing_key(self):
+        signing_key = get_signing_key(SECRET_KEY, '20120215', 'us-east-1', 'iam')
+        self.assertEqual(binascii.hexlify(signing_key).decode('ascii'), 'f4780e2d9f65fa895f9c67b32ce1baf0b0d8a43505a000a1a9e090d414db404d')
+
+        # The key is derived only once
+        self.assertIn((SECRET_KEY, '20120215', 'us-east-1', 'iam'), sigv4._SIGNING_KEYS)  # pylint: disable=protected-access
+        self.assertIs(get_signing_key(SECRET_KEY, '20120215', 'us-east-1', 'iam'), signing_key)
+
+    def test_get_vanilla(self):
+        signer = SigV4Signer(ACCESS_KEY, SECRET_KEY, 'us-east-1', 'service')
+        authorization = signer.get_authorization('GET', 'https://%s/' % HOST, {'Host': HOST, 'X-Amz-Date': AMZDATE}, None, AMZDATE)
+        self.assertEqual(authorization, 'AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/20150830/us-east-1/service/aws4_request, '
+                                        'SignedHeaders=host;x-amz-date, '
+                                        'Signature=5fa00fa31553b73ebf1942676e86291e8372ff2a2260956d9b8aae1d763fbf31')
+
+    def test_get_vanilla_query_order_key_case(self):
+        signer = SigV4Signer(ACCESS_KEY, SECRET_KEY, 'us-east-1', 'service')
+        authorization = signer.get_authorization('GET', 'https://%s/?Param2=value2&Param1=value1' % HOST, {'Host': HOST, 'X-Amz-Date': AMZDATE},
+                                                 None, AMZDATE)
+        self.assertEqual(authorization, 'AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/20150830/us-east-1/service/aws4_request, '
+                                        'SignedHeaders=host;x-amz-date, '
+                                        'Signature=b97d918cfa904a5beff61c982a1b6f458b799221646efd99d3219ec94cdf2500')
+
+    def test_canonical_querystring(self):
+        self.assertEqual(get_canonical_querystring(''), '')
+        self.assertEqual(get_canonical_querystring('b=2&a=2&a=1'), 'a=1&a=2&b=2')
+        self.assertEqual(get_canonical_querystring('key=a%20b&empty='), 'empty=&key=a%20b')
+
+    def test_sign_request(self):
+        signer = SigV4Signer(ACCESS_KEY, SECRET_KEY, 'us-east-1', 'service')
+        request = requests.Request(method='GET', url='https://%s/' % HOST).prepare()
+        signer.sign(request, now=datetime.datetime(2015, 8, 30, 12, 36, 0))
+        self.assertEqual(request.headers['x-amz-date'], AMZDATE)
+        self.assertTrue(request.headers['Authorization'].endswith('Signature=5fa00fa31553b73ebf1942676e86291e8372ff2a2260956d9b8aae1d763fbf31'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+""" Tests for the import cost of the plugin at startup """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+try:
+    import routing  # pylint: disable=unused-import
+    HAS_ROUTING = True
+except ImportError:
+    HAS_ROUTING = False
+
+# The modules the main menu route imports, besides routing
+STARTUP_MODULES = ['resources.lib.kodilogging', 'resources.lib.modules.menu']
+
+# All the modules of the add-on that are imported when Kodi opens the main menu
+MAIN_MENU_MODULES = ['resources', 'resources.lib', 'resources.lib.addon', 'resources.lib.kodilogging', 'resources.lib.kodiutils',
+                     'resources.lib.modules', 'resources.lib.modules.menu', 'resources.lib.viervijfzes', 'resources.lib.viervijfzes.cache',
+                     'resources.lib.viervijfzes.content', 'resources.lib.viervijfzes.extractor']
+
+# The number of modules that opening the main menu may import on top of what the interpreter imports by itself. This is about 60 now, the
+# rest is headroom for other versions of Python and routing.
+MAX_MAIN_MENU_IMPORTS = 80
+
+# The modules that should only be imported by the routes that need them
+LAZY_MODULES = ['requests', 'urllib3', 'dateutil', 'six', 'resources.lib.viervijfzes.transport', 'resources.lib.viervijfzes.auth',
+                'resources.lib.viervijfzes.aws', 'resources.lib.viervijfzes.epg']
+
+# Open the main menu through the entry point, like Kodi does
+MAIN_MENU = """
+import sys
+sys.argv = ['plugin://plugin.video.viervijfzes/', '1', '']
+exec(compile(open('addon_entry.py').read(), 'addon_entry.py', 'exec'), {'__name__': '__main__'})
+"""
+
+# A listing of the catalog that is served from the cache
+CACHED_LISTING = """
+from resources.lib import kodiutils
+from resources.lib.viervijfzes.cache import SqliteCacheStore
+from resources.lib.viervijfzes.content import CACHE_STALE_OK
+kodiutils.get_cache_path.cached = %r
+SqliteCacheStore(kodiutils.get_cache_path()).set(['programs'], [{'id': 'a1', 'link': '/de-mol', 'title': 'De Mol', 'pageInfo': {'brand': 'play4'}, 'images': {}}], 60)
+
+from resources.lib.modules.catalog import Catalog
+assert [program.title for program in Catalog()._api.get_programs(cache=CACHE_STALE_OK)] == ['De Mol']
+"""
+
+
+def profile_imports(code):
+    """ Run the code in a new interpreter, and return the cumulative import time in seconds of each module that was imported.
+    :type code: str
+    :rtype dict[str, float]
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stderr=subprocess.STDOUT, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=os.environ.copy(),
+    ).decode('utf-8')
+
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports[name.strip()] = int(cumulative) / 1000000
+    return imports
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'Skipping since -X importtime requires Python 3.7.')
+class TestStartup(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(TestStartup, self).__init__(*args, **kwargs)
+
+    def test_lazy_imports(self):
+        imports = profile_imports('import %s' % ', '.join(STARTUP_MODULES))
+        for module in STARTUP_MODULES:
+            self.assertIn(module, imports)
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, imports, '%s should not be imported at startup' % module)
+
+    @unittest.skipUnless(HAS_ROUTING, 'Skipping since routing is not installed.')
+    def test_main_menu(self):
+        imports = profile_imports(MAIN_MENU)
+        self.assertEqual(sorted(module for module in imports if module.split('.')[0] == 'resources'), MAIN_MENU_MODULES)
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, imports, '%s should not be imported at startup' % module)
+
+        # Catch the imports of other packages and the standard library as well
+        added = set(imports) - set(profile_imports('pass'))
+        self.assertLessEqual(len(added), MAX_MAIN_MENU_IMPORTS, 'Opening the main menu imports too many modules: %s' % ', '.join(sorted(added)))
+
+    def test_cached_listing(self):
+        cache_path = tempfile.mkdtemp()
+        try:
+            imports = profile_imports(CACHED_LISTING % cache_path)
+        finally:
+            shutil.rmtree(cache_path)
+        self.assertIn('resources.lib.modules.catalog', imports)
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, imports, '%s should not be imported for a listing from the cache' % module)
+
+
+if __name__ == '__main__':
+    unittest.main()
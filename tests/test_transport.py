@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+""" Tests for the HTTP transport """
+
+# pylint: disable=missing-docstring,no-self-use
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+import requests
+
+from resources.lib import context, kodiutils
+from resources.lib.viervijfzes import budget, transport
+from resources.lib.viervijfzes.auth import AuthApi
+from resources.lib.viervijfzes.aws.cognito_idp import CognitoIdp
+from resources.lib.viervijfzes.content import ContentApi
+from resources.lib.viervijfzes.epg import EpgApi
+from resources.lib.viervijfzes.search import SearchApi
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        # Keep the metrics of the latency budgets in a cache of our own
+        self._cache_path = kodiutils.get_cache_path()
+        kodiutils.get_cache_path.cached = tempfile.mkdtemp()
+        context.reset()
+
+    def tearDown(self):
+        transport.reset_session()
+        context.get_cache().close()
+        shutil.rmtree(kodiutils.get_cache_path())
+        kodiutils.get_cache_path.cached = self._cache_path
+        context.reset()
+
+    def test_shared_session(self):
+        session = transport.get_session()
+        self.assertIs(transport.get_session(), session)
+        self.assertIs(ContentApi()._get_session(), session)  # pylint: disable=protected-access
+        self.assertIs(EpgApi()._get_session(), session)  # pylint: disable=protected-access
+
+        transport.reset_session()
+        self.assertIsNot(transport.get_session(), session)
+
+    def test_adapter(self):
+        adapter = transport.get_session().get_adapter('https://www.goplay.be')
+        self.assertIsInstance(adapter, transport.TimeoutHTTPAdapter)
+        self.assertEqual(adapter.timeout, transport.DEFAULT_TIMEOUT)
+        self.assertEqual(adapter.max_retries.total, transport.RETRY_TOTAL)
+        self.assertIn('gzip', transport.get_session().headers['Accept-Encoding'])
+
+    def test_proxies(self):
+        os.environ['HTTP_PROXY'] = 'http://proxy.example.com:3128'
+        try:
+            transport.reset_session()
+            self.assertEqual(transport.get_session().proxies.get('https'), 'http://proxy.example.com:3128')
+        finally:
+            del os.environ['HTTP_PROXY']
+
+    def test_proxies_changed(self):
+        session = transport.get_session()
+        search_api = SearchApi(ContentApi())
+        idp_client = CognitoIdp(AuthApi.COGNITO_POOL_ID, AuthApi.COGNITO_CLIENT_ID)
+        os.environ['HTTP_PROXY'] = 'http://proxy.example.com:3128'
+        try:
+            # The session is created again with the new proxy settings
+            changed = transport.get_session()
+            self.assertIsNot(changed, session)
+            self.assertEqual(changed.proxies.get('https'), 'http://proxy.example.com:3128')
+            self.assertIs(transport.get_session(), changed)
+
+            # The API clients that were created before use the new session
+            self.assertIs(search_api._get_session(), changed)  # pylint: disable=protected-access
+            self.assertIs(idp_client._get_session(), changed)  # pylint: disable=protected-access
+        finally:
+            del os.environ['HTTP_PROXY']
+
+    def test_proxies_memoized(self):
+        calls = []
+
+        def get_global_setting(key):
+            calls.append(key)
+            return False  # No proxy is used
+
+        original = kodiutils.get_global_setting
+        kodiutils.get_global_setting = get_global_setting
+        try:
+            transport.reset_session()
+            transport.get_session()
+            kodiutils.get_proxies()
+            self.assertEqual(calls.count('network.usehttpproxy'), 1)
+
+            # The settings are read again when the session is reset
+            transport.reset_session()
+            transport.get_session()
+            self.assertEqual(calls.count('network.usehttpproxy'), 2)
+        finally:
+            kodiutils.get_global_setting = original
+            kodiutils.invalidate_proxies()
+
+    def test_latency_budget(self):
+        self.assertIsNone(budget.get_remaining_budget())
+        with budget.latency_budget('test_outer', 10):
+            self.assertLessEqual(budget.get_remaining_budget(), 10)
+            with budget.latency_budget('test_inner', 5):
+                self.assertLessEqual(budget.get_remaining_budget(), 5)
+            self.assertGreater(budget.get_remaining_budget(), 5)
+        self.assertIsNone(budget.get_remaining_budget())
+        self.assertEqual(budget.get_metrics()['test_inner'], {'calls': 1, 'exceeded': 0})
+
+    def test_latency_budget_exceeded(self):
+        @budget.latency_budget('test_exceeded', 0)
+        def fetch():
+            return transport.get_session().get('https://www.goplay.be')
+
+        # We don't even try to connect when the budget is used up
+        with self.assertRaises(transport.BudgetExceededException):
+            fetch()
+        self.assertEqual(budget.get_metrics()['test_exceeded'], {'calls': 1, 'exceeded': 1})
+
+    def test_latency_budget_metrics(self):
+        with budget.latency_budget('test_metrics', 10):
+            pass
+        with budget.latency_budget('test_metrics', 0):
+            time.sleep(0.01)
+
+        # The metrics are kept in the cache, so the next invocation of the add-on still has them
+        context.get_cache().close()
+        context.reset()
+        self.assertEqual(budget.get_metrics()['test_metrics'], {'calls': 2, 'exceeded': 1})
+        self.assertEqual(context.get_cache().get_budget_metrics()['test_metrics'], {'calls': 2, 'exceeded': 1})
+
+    def test_latency_budget_unresponsive(self):
+        # A server that accepts connections, but never replies
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(5)
+        try:
+            url = 'http://127.0.0.1:%d/' % server.getsockname()[1]
+            start = time.time()
+            with self.assertRaises(requests.exceptions.RequestException):
+                with budget.latency_budget('test_unresponsive', 1):
+                    transport.get_session().get(url)
+
+            # We don't retry within a budget, so the budget bounds the whole request
+            self.assertLess(time.time() - start, 2)
+        finally:
+            server.close()
+
+    def test_cap_timeout(self):
+        self.assertEqual(transport._cap_timeout((5, 15), 10), (5, 10))  # pylint: disable=protected-access
+        self.assertEqual(transport._cap_timeout(30, 2), (2, 2))  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()